@@ -0,0 +1,86 @@
+"""
+Import time of the project modules, measured with python -X importtime.
+
+Imports each module in a fresh interpreter (best of --repeat runs) and
+reports its cumulative import time and which plotting packages
+(matplotlib, seaborn, plotly) it pulled in. The data-processing modules
+(utils, pipeline, aggregate) must not load any of them.
+
+With --save the times are written to a JSON file; with --baseline they
+are compared to such a file and the script exits with status 1 when a
+module got more than --tolerance (default 20%) slower, or when a data
+module loads a plotting package.
+
+Usage:
+    python benchmarks/bench_import_time.py [--repeat 5] [module ...]
+    python benchmarks/bench_import_time.py --save .benchmarks/import_time.json
+    python benchmarks/bench_import_time.py --baseline .benchmarks/import_time.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+MODULES = ["utils", "pipeline", "aggregate", "cli", "visualizations"]
+DATA_MODULES = ("utils", "pipeline", "aggregate")
+PLOTTING = ("matplotlib", "seaborn", "plotly")
+
+
+def import_time(module):
+    """(cumulative import time [ms], plotting packages loaded) of 'module'."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": str(SRC)},
+    )
+    # lines: "import time: <self us> | <cumulative us> | <indent><name>"
+    rows = [line.split("|") for line in out.stderr.splitlines()
+            if line.startswith("import time:") and "cumulative" not in line]
+    cumulative = {name.strip(): int(total) for _, total, name in rows}
+    loaded = sorted(p for p in PLOTTING if p in cumulative)
+    return cumulative[module] / 1000, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", type=Path, help="write the times to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare with a file written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (default 0.2)")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+    times, failures = {}, []
+
+    print(f"{'module':<16} {'import [ms]':>12} {'baseline':>10}  plotting packages")
+    for module in args.modules:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        best = min(ms for ms, _ in runs)
+        loaded = runs[0][1]
+        times[module] = round(best, 1)
+
+        reference = baseline.get(module)
+        print(f"{module:<16} {best:>12.1f} {reference if reference else '-':>10}  "
+              f"{', '.join(loaded) or '-'}")
+        if reference and best > reference * (1 + args.tolerance):
+            failures.append(f"{module}: {best:.1f} ms, baseline {reference} ms")
+        if module in DATA_MODULES and loaded:
+            failures.append(f"{module} loads {', '.join(loaded)}")
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(times, indent=2))
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import tracemalloc
+
+import pytest
+
+from synthetic import make_metadata, make_raw_year
+
+# test name -> peak traced memory [MiB], printed after the timing table
+PEAKS = {}
+
+# frame name -> deep memory usage [MiB], printed after the peaks
+SIZES = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("gios", "synthetic GIOŚ data size")
+    group.addoption("--stations", type=int, default=50, help="stations per year")
+    group.addoption("--cities", type=int, default=7, help="cities the stations are spread over")
+    group.addoption("--years", default="2015,2018", help="comma-separated years")
+    group.addoption("--hours", type=int, default=None, help="hours per year (default: whole year)")
+
+
+@pytest.fixture(scope="session")
+def years(request):
+    return [int(year) for year in request.config.getoption("--years").split(",")]
+
+
+@pytest.fixture(scope="session")
+def metadata(request):
+    return make_metadata(request.config.getoption("--stations"),
+                         request.config.getoption("--cities"))
+
+
+@pytest.fixture(scope="session")
+def raw_years(request, metadata, years):
+    hours = request.config.getoption("--hours")
+    return {year: make_raw_year(metadata, year, n_hours=hours) for year in years}
+
+
+@pytest.fixture
+def measure(request, benchmark):
+    """
+    Times func(*args) with pytest-benchmark and records the peak traced
+    memory of one extra, untimed call in extra_info['peak_mib']
+    (tracemalloc slows the code down, so it stays out of the timings).
+    """
+    def run(func, *args):
+        tracemalloc.start()
+        func(*args)
+        peak = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+        benchmark.extra_info["peak_mib"] = PEAKS[request.node.name] = peak
+        return benchmark(func, *args)
+
+    return run
+
+
+@pytest.fixture
+def record_size(benchmark):
+    """Records the memory usage of a frame built by the test, in extra_info as well."""
+    def record(name, mib):
+        benchmark.extra_info[f"{name} [MiB]"] = SIZES[name] = round(float(mib), 2)
+
+    return record
+
+
+def pytest_terminal_summary(terminalreporter):
+    for title, values in [("peak traced memory [MiB]", PEAKS), ("frame size [MiB]", SIZES)]:
+        if not values:
+            continue
+        terminalreporter.section(title)
+        for name, value in sorted(values.items(), key=lambda item: item[1]):
+            terminalreporter.write_line(f"{name:<40} {value:>10.2f}")
@@ -0,0 +1,75 @@
+"""
+Synthetic GIOŚ-shaped data for the benchmark suite.
+
+make_metadata builds a Metadata.xlsx-like frame where stations are spread
+over n_cities cities and a share of them also has a former code; make_raw_year builds the raw hourly sheet of one
+year as read_excel(header=None) returns it: header rows in the layout of
+that year, former station codes in the header, text readings with decimal
+commas and blanks.
+"""
+import numpy as np
+import pandas as pd
+
+from stations import OLD_CODE_COLUMN
+
+CITIES = ["Warszawa", "Katowice", "Kraków", "Wrocław", "Gdańsk", "Poznań", "Łódź"]
+
+
+def make_metadata(n_stations, n_cities=len(CITIES), old_code_share=0.2, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = [f"St{i:04d}" for i in range(n_stations)]
+    cities = (CITIES + [f"Miasto{i:03d}" for i in range(len(CITIES), n_cities)])[:n_cities]
+    old = np.where(rng.random(n_stations) < old_code_share,
+                   [f"Old{i:04d}" for i in range(n_stations)], None)
+    return pd.DataFrame({
+        "Kod stacji": codes,
+        "Miejscowość": [cities[i % n_cities] for i in range(n_stations)],
+        "Województwo": [f"WOJ{i % 16}" for i in range(n_stations)],
+        "WGS84 φ N": rng.uniform(49.0, 54.8, n_stations),
+        "WGS84 λ E": rng.uniform(14.1, 24.1, n_stations),
+        OLD_CODE_COLUMN: old,
+    })
+
+
+def make_timestamps(year, n_hours=None, drift=False):
+    """
+    Text time column of a year's sheet; with drift, the fractional seconds
+    of sheets saved by Excel (up to ~44 s by the end of the year, as in
+    the 2015 sheet).
+    """
+    times = pd.date_range(f"{year}-01-01 01:00", f"{year + 1}-01-01 00:00", freq="h")
+    times = times[:n_hours] if n_hours else times
+    if drift:
+        times = times + pd.to_timedelta(np.arange(len(times)) * 5000, unit="us")
+        return pd.Series(times.strftime("%Y-%m-%d %H:%M:%S.%f"), dtype=object)
+    return pd.Series(times.strftime("%Y-%m-%d %H:%M:%S"), dtype=object)
+
+
+def make_raw_year(metadata, year, n_hours=None, missing=0.05, seed=0):
+    rng = np.random.default_rng(seed + year)
+    times = make_timestamps(year, n_hours)
+    n_stations = len(metadata)
+
+    # the sheet lists the former code where a station has one
+    old = metadata[OLD_CODE_COLUMN]
+    codes = list(old.where(old.notna(), metadata["Kod stacji"]))
+
+    values = rng.gamma(2.0, 10.0, size=(len(times), n_stations)).round(3)
+    text = np.char.replace(values.astype(str), ".", ",").astype(object)
+    text[rng.random(size=text.shape) < missing] = None
+
+    header = [
+        ["Kod stacji", *codes],
+        ["Wskaźnik", *["PM2.5"] * n_stations],
+        ["Czas uśredniania", *["1g"] * n_stations],
+    ]
+    if year > 2015:
+        header = [
+            ["Nr", *range(1, n_stations + 1)],
+            *header,
+            ["Jednostka", *["ug/m3"] * n_stations],
+            ["Kod stanowiska", *[f"{c}-PM2.5-1g" for c in codes]],
+        ]
+
+    data = np.column_stack([times.to_numpy(dtype=object), text])
+    return pd.DataFrame([*header, *data.tolist()])
@@ -0,0 +1,254 @@
+"""
+Per-stage benchmarks of the cleaning and aggregation pipeline on synthetic
+GIOŚ data (see synthetic.py); every stage gets the output of the previous
+one, for the first configured year unless it works on all years.
+
+Usage:
+    pytest benchmarks --stations 100 --years 2015,2018,2021,2024
+    pytest benchmarks -k heatmap --stations 240 --cities 120
+    pytest benchmarks --benchmark-autosave      # keep results for comparison
+    pytest benchmarks --benchmark-compare       # against the last saved run
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregate import aggregate_all
+from cube import PM25Cube, aggregate_cubes, combine_cubes
+from means import HeatmapCube, prepare_ex3_heatmap_df
+from raw_cache import to_typed_wide
+from stations import StationIndex
+from synthetic import make_timestamps
+from timestamps import align_time_axis, parse_timestamps
+from utils import (
+    add_city,
+    assign_measurement_day,
+    clean_gios_df,
+    memory_report,
+    normalize_station_codes,
+    station_dictionary,
+    to_long
+)
+
+
+@pytest.fixture(scope="session")
+def stations(metadata):
+    return StationIndex.from_metadata(metadata)
+
+
+@pytest.fixture(scope="session")
+def typed_years(raw_years):
+    return {
+        year: to_typed_wide(clean_gios_df(raw, year)).reset_index()
+        for year, raw in raw_years.items()
+    }
+
+
+@pytest.fixture(scope="session")
+def cubes(typed_years, stations):
+    return [
+        PM25Cube.from_wide(normalize_station_codes(typed, stations), year, stations)
+        for year, typed in typed_years.items()
+    ]
+
+
+@pytest.fixture(scope="session")
+def combined(stations, cubes):
+    return combine_cubes(stations, *cubes)
+
+
+@pytest.fixture(scope="session")
+def first_year(years):
+    return years[0]
+
+
+@pytest.fixture(scope="session")
+def city_long(typed_years, stations, first_year):
+    # the long frame with cities of the first year, before measurement days
+    normalized = normalize_station_codes(typed_years[first_year], stations)
+    return add_city(to_long(normalized, station_dictionary(stations)), stations)
+
+
+@pytest.fixture(scope="session")
+def df_ex3(combined):
+    return prepare_ex3_heatmap_df(aggregate_all(combined)["monthly_PM25"])
+
+
+@pytest.fixture(scope="session")
+def plotting():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+# -------------------- per-year stages --------------------
+
+def test_clean_gios_df(measure, raw_years, first_year):
+    measure(clean_gios_df, raw_years[first_year], first_year)
+
+
+def test_to_typed_wide(measure, raw_years, first_year):
+    clean = clean_gios_df(raw_years[first_year], first_year)
+    measure(to_typed_wide, clean)
+
+
+def test_normalize_station_codes(measure, typed_years, stations, first_year):
+    measure(normalize_station_codes, typed_years[first_year], stations)
+
+
+def test_to_long(measure, typed_years, stations, first_year):
+    normalized = normalize_station_codes(typed_years[first_year], stations)
+    measure(to_long, normalized, station_dictionary(stations))
+
+
+def test_to_long_text_input(measure, raw_years, first_year):
+    # without the float32 Parquet cache, readings are still text with decimal commas
+    measure(to_long, clean_gios_df(raw_years[first_year], first_year))
+
+
+def legacy_to_long(df):
+    # melt with the readings parsed through str, as to_long did before
+    long = pd.melt(df, id_vars=["Datetime"], var_name="station", value_name="PM2.5")
+    long["PM2.5"] = pd.to_numeric(
+        long["PM2.5"].astype(str).str.replace(",", ".", regex=False), errors="coerce"
+    )
+    return long
+
+
+def test_legacy_to_long(measure, raw_years, first_year):
+    measure(legacy_to_long, clean_gios_df(raw_years[first_year], first_year))
+
+
+def test_add_city(measure, typed_years, stations, first_year):
+    normalized = normalize_station_codes(typed_years[first_year], stations)
+    long = to_long(normalized, station_dictionary(stations))
+    measure(add_city, long, stations)
+
+
+def test_assign_measurement_day(measure, city_long):
+    measure(assign_measurement_day, city_long.copy())
+
+
+def legacy_measurement_day(df):
+    # per-row shift of midnight readings that assign_measurement_day replaced
+    df["date"] = df["Datetime"].apply(
+        lambda x: x.date() if x.hour != 0 else (x - pd.Timedelta(days=1)).date()
+    )
+    df["month"] = pd.to_datetime(df["date"]).dt.month
+    return df
+
+
+def test_legacy_measurement_day(measure, city_long):
+    measure(legacy_measurement_day, city_long.copy())
+
+
+def test_year_cube(measure, typed_years, stations, first_year):
+    # replaces to_long + add_city + assign_measurement_day in the pipeline
+    normalized = normalize_station_codes(typed_years[first_year], stations)
+    measure(PM25Cube.from_wide, normalized, first_year, stations)
+
+
+@pytest.fixture(params=[False, True], ids=["exact", "drift"])
+def timestamps(request, first_year):
+    return make_timestamps(first_year, request.config.getoption("--hours"), drift=request.param)
+
+
+def test_legacy_melted_timestamps(measure, timestamps, metadata):
+    # the time column repeated once per station after melting, format inferred
+    melted = pd.Series(np.tile(timestamps.to_numpy(), len(metadata)), dtype=object)
+    measure(functools.partial(pd.to_datetime, errors="coerce", dayfirst=True), melted)
+
+
+def test_parse_timestamps(measure, timestamps):
+    measure(parse_timestamps, timestamps)
+
+
+def test_align_time_axis(measure, timestamps, first_year):
+    measure(align_time_axis, parse_timestamps(timestamps), first_year)
+
+
+# -------------------- all years --------------------
+
+def test_combine_cubes(measure, stations, cubes):
+    measure(combine_cubes, stations, *cubes)
+
+
+def previous_schema(long):
+    # the long frame in the dtypes used before the compact schema
+    previous = long.astype({"station": object, "city": object, "year": "int64",
+                            "month": "int64", "PM2.5": "float64"})
+    previous["date"] = previous["date"].dt.date
+    return previous
+
+
+def test_long_schema_memory(benchmark, record_size, combined):
+    record_size("compact schema", memory_report(combined).loc["total", "MiB"])
+    record_size("previous schema", memory_report(previous_schema(combined)).loc["total", "MiB"])
+    benchmark(memory_report, combined)
+
+
+def test_aggregate_all(measure, combined):
+    measure(aggregate_all, combined)
+
+
+def test_aggregate_cubes(measure, cubes):
+    measure(aggregate_cubes, *cubes)
+
+
+def legacy_groupbys(combined):
+    # groupby-based aggregation that aggregate_all replaced, as a reference
+    monthly = combined.groupby(
+        ["year", "month", "station", "city"], as_index=False, observed=True
+    )[["PM2.5"]].mean()
+    daily_avg = combined.groupby(
+        ["year", "station", "city", "date"], observed=True
+    )[["PM2.5"]].mean().reset_index()
+    daily_avg["exceeded"] = daily_avg["PM2.5"] > 15
+    return monthly, daily_avg.groupby(
+        ["year", "station", "city"], observed=True
+    )["exceeded"].sum().reset_index()
+
+
+def test_legacy_groupbys(measure, combined):
+    measure(legacy_groupbys, combined)
+
+
+# -------------------- heatmaps of all cities --------------------
+
+def legacy_heatmap_pivots(df_ex3, cities, years):
+    # filter and pivot per city, as plot_city_heatmaps did before HeatmapCube
+    return [
+        df_ex3[df_ex3["city"] == city]
+        .pivot(index="year", columns="month", values="PM2.5")
+        .reindex(index=years).reindex(columns=range(1, 13))
+        for city in cities
+    ]
+
+
+def test_legacy_heatmap_pivots(measure, df_ex3, years):
+    measure(legacy_heatmap_pivots, df_ex3, sorted(df_ex3["city"].unique()), years)
+
+
+def test_heatmap_cube(measure, df_ex3):
+    measure(HeatmapCube.from_df, df_ex3)
+
+
+def test_plot_city_heatmaps(benchmark, plotting, df_ex3, years, tmp_path):
+    from visualizations import plot_city_heatmaps
+
+    def one_grid():
+        fig = plot_city_heatmaps(df_ex3, sorted(df_ex3["city"].unique()), years=years)
+        fig.savefig(tmp_path / "all.png", dpi=100)
+        plotting.close(fig)
+
+    benchmark.pedantic(one_grid, rounds=3)
+
+
+def test_render_heatmaps(benchmark, plotting, df_ex3, tmp_path):
+    from visualizations import render_heatmaps
+
+    cube = HeatmapCube.from_df(df_ex3)
+    benchmark.pedantic(render_heatmaps, (cube, tmp_path), {"per_page": 12}, rounds=3)
@@ -1,6 +1,10 @@
-def main():
-    print("Hello from projekt3!")
+import sys
+from pathlib import Path
 
+# modules live flat in src/ (as for the notebook and the tests)
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
+from cli import main
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,318 @@
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from stations import align_stations
+from utils import (
+    normalize_station_codes,
+    station_dictionary,
+    to_long,
+    add_city,
+    assign_measurement_day,
+    unify_categories
+)
+
+logger = logging.getLogger(__name__)
+
+# WHO daily guideline for PM2.5 [µg/m³]
+WHO_DAILY_LIMIT = 15
+
+# share of hours (of a day) and of days (of a month) needed for a valid
+# mean under the EU air-quality directive data-capture rule
+MIN_COVERAGE = 0.75
+
+HOURS_PER_DAY = 24
+
+
+def _as_categorical(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    codes, categories = pd.factorize(values, sort=True)
+    return codes, pd.Index(categories)
+
+
+def _span(values):
+    """First value and number of slots covering values (1 slot if empty)."""
+    if not len(values):
+        return 0, 1
+    first = int(values.min())
+    return first, int(values.max()) - first + 1
+
+
+def daily_sums(hourly):
+    """
+    Sums and counts of valid hourly readings per station and measurement day.
+
+    This is the only pass over hourly rows: station and day are encoded as
+    one integer key and reduced with np.bincount. Rows without a station,
+    a city or a reading are left out, as groupby would.
+    """
+    station_codes, stations = _as_categorical(hourly["station"])
+    city_codes, city_names = _as_categorical(hourly["city"])
+    values = hourly["PM2.5"].to_numpy(dtype=np.float64)
+    keep = (station_codes >= 0) & (city_codes >= 0) & ~np.isnan(values)
+
+    station_codes = station_codes[keep].astype(np.int64)
+    values = values[keep]
+    years = hourly["year"].to_numpy()[keep]
+    days = hourly["date"].to_numpy()[keep].astype("datetime64[D]").astype(np.int64)
+
+    # each station belongs to one city
+    station_city = np.full(len(stations), -1, dtype=np.int64)
+    station_city[station_codes] = city_codes[keep]
+
+    first_day, n_days = _span(days)
+    cell = station_codes * n_days + (days - first_day)
+    n_cells = len(stations) * n_days
+
+    sums = np.bincount(cell, weights=values, minlength=n_cells)
+    counts = np.bincount(cell, minlength=n_cells)
+    cell_year = np.zeros(n_cells, dtype=np.int16)
+    cell_year[cell] = years
+
+    observed = np.flatnonzero(counts)
+    day_station, day_offset = np.divmod(observed, n_days)
+    return pd.DataFrame({
+        "year": cell_year[observed],
+        "station": pd.Categorical.from_codes(day_station, categories=stations),
+        "city": pd.Categorical.from_codes(station_city[day_station], categories=city_names),
+        "date": (day_offset + first_day).astype("datetime64[D]").astype("datetime64[us]"),
+        "sum": sums[observed],
+        "count": counts[observed].astype(np.int32),
+    })
+
+
+def tables_from_daily(daily, threshold=WHO_DAILY_LIMIT, cities=("Warszawa", "Katowice"),
+                      min_coverage=None):
+    """
+    Derives 'daily', 'monthly_PM25', 'df_ex2' and 'df_ex4' from the output
+    of daily_sums (or merge_partials). Monthly means are computed from the
+    daily sums and counts, so they equal the mean of the hourly readings.
+
+    Every table carries its valid-sample counts: n_hours per day, n_hours
+    and n_days per month, n_days per station-year. With min_coverage
+    (e.g. MIN_COVERAGE = 0.75) a day counts only with at least that share
+    of its 24 hours, and a month only with that share of valid days;
+    other days are left out of monthly means and exceedance counts, and
+    such months are dropped. None keeps every day.
+    """
+    station_codes = daily["station"].cat.codes.to_numpy().astype(np.int64)
+    stations = daily["station"].cat.categories
+    city_codes = daily["city"].cat.codes.to_numpy()
+    city_names = daily["city"].cat.categories
+    sums = daily["sum"].to_numpy()
+    counts = daily["count"].to_numpy()
+    years = daily["year"].to_numpy()
+    dates = daily["date"].to_numpy()
+
+    station_city = np.full(len(stations), -1, dtype=np.int64)
+    station_city[station_codes] = city_codes
+
+    # float32 like the stored PM2.5, so a mean at the threshold compares the same way
+    day_means = (sums / counts).astype(np.float32)
+    valid = (counts >= min_coverage * HOURS_PER_DAY if min_coverage is not None
+             else np.ones(len(counts), dtype=bool))
+
+    days = pd.DataFrame({
+        "year": years,
+        "station": daily["station"].array,
+        "city": daily["city"].array,
+        "date": dates,
+        "PM2.5": day_means,
+        "n_hours": counts.astype(np.int16),
+        "valid": valid,
+    }).sort_values(["year", "station", "date"], ignore_index=True)
+
+    # ---- monthly means from the sums and counts of valid days ----
+    month_num = dates.astype("datetime64[M]").astype(np.int64)
+    first_month, n_months = _span(month_num)
+    month_cell = station_codes * n_months + (month_num - first_month)
+    n_cells = len(stations) * n_months
+
+    month_sums = np.bincount(month_cell, weights=sums * valid, minlength=n_cells)
+    month_counts = np.bincount(month_cell, weights=counts * valid, minlength=n_cells)
+    month_days = np.bincount(month_cell, weights=valid, minlength=n_cells)
+    month_observed = np.flatnonzero(month_counts)
+    month_station, month_offset = np.divmod(month_observed, n_months)
+    month_index = month_offset + first_month
+
+    if min_coverage is not None:
+        month_start = month_index.astype("datetime64[M]")
+        days_in_month = ((month_start + np.timedelta64(1, "M")).astype("datetime64[D]")
+                         - month_start.astype("datetime64[D]")).astype(np.int64)
+        enough = month_days[month_observed] >= min_coverage * days_in_month
+        month_observed, month_station, month_index = (
+            month_observed[enough], month_station[enough], month_index[enough]
+        )
+
+    monthly_PM25 = pd.DataFrame({
+        "year": (month_index // 12 + 1970).astype(np.int16),
+        "month": (month_index % 12 + 1).astype(np.int8),
+        "station": pd.Categorical.from_codes(month_station, categories=stations),
+        "city": pd.Categorical.from_codes(station_city[month_station], categories=city_names),
+        "PM2.5": (month_sums[month_observed] / month_counts[month_observed]).astype(np.float32),
+        "n_hours": month_counts[month_observed].astype(np.int16),
+        "n_days": month_days[month_observed].astype(np.int8),
+    }).sort_values(["year", "month", "station"], ignore_index=True)
+
+    # ---- exceedance counts per station and year, valid days only ----
+    first_year, n_years = _span(years)
+    year_cell = station_codes * n_years + (years - first_year)
+    n_cells = len(stations) * n_years
+    exceeded = np.bincount(year_cell, weights=(day_means > threshold) & valid, minlength=n_cells)
+    year_days = np.bincount(year_cell, weights=valid, minlength=n_cells)
+    station_years = np.flatnonzero(np.bincount(year_cell, minlength=n_cells))
+    year_station, year_offset = np.divmod(station_years, n_years)
+
+    df_ex4 = pd.DataFrame({
+        "year": (year_offset + first_year).astype(np.int16),
+        "station": pd.Categorical.from_codes(year_station, categories=stations),
+        "city": pd.Categorical.from_codes(station_city[year_station], categories=city_names),
+        "exceeded": exceeded[station_years].astype(np.int64),
+        "n_days": year_days[station_years].astype(np.int16),
+    }).sort_values(["year", "station"], ignore_index=True)
+
+    # ---- city means for the selected cities (small monthly table) ----
+    selected = monthly_PM25[monthly_PM25["city"].isin(list(cities))]
+    df_ex2 = selected.groupby(
+        ["year", "month", "city"], as_index=False, observed=True
+    )[["PM2.5"]].mean()
+
+    logger.info(
+        f"Agregacja: {len(days)} dni, {len(monthly_PM25)} miesięcy, "
+        f"{len(df_ex4)} stacjo-lat"
+    )
+    return {
+        "daily": days,
+        "monthly_PM25": monthly_PM25,
+        "df_ex2": df_ex2,
+        "df_ex4": df_ex4,
+    }
+
+
+def aggregate_all(combined, threshold=WHO_DAILY_LIMIT, cities=("Warszawa", "Katowice"),
+                  min_coverage=None):
+    """
+    Computes every derived table from the hourly data in one pass.
+
+    Monthly means, daily exceedance flags and yearly exceedance counts
+    are derived from the small station x day grid of daily_sums, not
+    from the hourly rows. Returns a dict with 'daily', 'monthly_PM25',
+    'df_ex2' and 'df_ex4'; min_coverage as in tables_from_daily.
+    """
+    return tables_from_daily(daily_sums(combined), threshold, cities, min_coverage)
+
+
+# -------------------- daily cube --------------------
+
+DAILY_CUBE = "daily_PM25.parquet"
+
+
+def write_daily_cube(daily, path):
+    """
+    Stores the 'daily' table (station x day float32 mean and valid-hour
+    count n_hours) as Parquet, sorted by year, station and date.
+    """
+    daily.to_parquet(path, index=False)
+    logger.info(f"Zapisano kostkę dobową: {path} ({len(daily)} wierszy)")
+    return path
+
+
+def read_daily_cube(path, columns=None, filters=None):
+    """Reads the daily cube; 'filters' are pyarrow row filters, e.g. [("year", "==", 2018)]."""
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def cube_tables(cube, threshold=WHO_DAILY_LIMIT, cities=("Warszawa", "Katowice"),
+                min_coverage=None):
+    """
+    aggregate_all answered from the daily cube instead of hourly rows.
+
+    Mean times n_hours restores each day's hourly sum, so monthly means
+    stay hourly-weighted; exceedances can be recounted at any threshold.
+    """
+    sums = pd.DataFrame({
+        "year": cube["year"].to_numpy(),
+        "station": cube["station"].array,
+        "city": cube["city"].array,
+        "date": cube["date"].to_numpy(),
+        "sum": cube["PM2.5"].to_numpy(dtype=np.float64) * cube["n_hours"].to_numpy(),
+        "count": cube["n_hours"].to_numpy(dtype=np.int32),
+    })
+    return tables_from_daily(sums, threshold, cities, min_coverage)
+
+
+# -------------------- out-of-core mode --------------------
+
+@dataclass
+class Partial:
+    """Daily sums and counts of one chunk and the stations with readings in it."""
+    daily: pd.DataFrame
+    stations: frozenset
+
+
+def year_partials(wide, year, stations, chunk_hours=None):
+    """
+    Runs one year of clean wide data through normalize -> long -> city ->
+    measurement day in blocks of chunk_hours rows (whole year if None)
+    and yields a Partial per block; only the block's long frame is held
+    in memory at a time.
+    """
+    normalized = normalize_station_codes(wide, stations)
+    dictionary = station_dictionary(stations)
+    step = chunk_hours or max(len(normalized), 1)
+
+    for start in range(0, len(normalized), step):
+        block = normalized.iloc[start:start + step]
+        long = add_city(to_long(block, stations=dictionary), stations)
+        long["year"] = np.full(len(long), year, dtype="int16")
+        long = assign_measurement_day(long.dropna(subset=["Datetime", "PM2.5"]))
+        present = frozenset(long["station"].dropna().unique().astype(str))
+        yield Partial(daily_sums(long), present)
+
+
+def merge_partials(partials, station_policy="intersection", min_years=None):
+    """
+    Adds up Partials into one daily_sums frame, keeping the stations
+    chosen by stations.align_stations from the stations with readings in
+    each year (by default those present in every year), like cube.common_stations
+    does for the yearly cubes. A station-day split across blocks gets its sums
+    and counts added.
+    """
+    partials = list(partials)
+    by_year = {}
+    for part in partials:
+        for year in pd.unique(part.daily["year"]):
+            by_year.setdefault(year, set()).update(part.stations)
+    kept = align_stations(by_year, station_policy, min_years).stations
+
+    frames = [part.daily for part in partials]
+    for column in ("station", "city"):
+        frames = unify_categories(frames, column)
+    daily = pd.concat(frames, ignore_index=True)
+    daily = daily[daily["station"].isin(kept)]
+
+    return daily.groupby(
+        ["year", "station", "city", "date"], as_index=False, observed=True
+    ).agg({"sum": "sum", "count": "sum"})
+
+
+def stream_aggregate(years, load_year, stations, chunk_hours=None,
+                     threshold=WHO_DAILY_LIMIT, cities=("Warszawa", "Katowice"),
+                     min_coverage=None, station_policy="intersection", min_years=None):
+    """
+    Out-of-core variant of cube.aggregate_cubes.
+
+    load_year(year) returns the clean wide frame of one year. Years are
+    processed one at a time and only their daily partial sums are kept,
+    so peak memory is bounded by one year (or one chunk_hours block),
+    however many years are processed.
+    """
+    partials = []
+    for year in years:
+        logger.info(f"Agregacja strumieniowa roku {year}")
+        partials.extend(year_partials(load_year(year), year, stations, chunk_hours))
+    return tables_from_daily(merge_partials(partials, station_policy, min_years), threshold,
+                             cities, min_coverage)
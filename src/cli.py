@@ -0,0 +1,347 @@
+"""
+Command-line interface of the GIOŚ PM2.5 workflow.
+
+    python main.py download  [--years 2015 2018 ...] [--pollutants PM25 PM10]
+    python main.py clean     [--years ...] [--min-coverage 0.75] [--chunked] [--csv]
+                             [--stations intersection|union|min_years --min-years 3]
+    python main.py aggregate --threshold 25 [--min-coverage 0.75] [--csv]
+    python main.py plot      exceeded|trends|heatmaps|voivodeships
+    python main.py plot      heatmaps --per-page 12 [--workers 4]   # all cities
+    python main.py years     # cached years and archives
+    python main.py stats     # stage timings from data/stats/stages.jsonl
+
+The commands are also plain functions (download, clean, aggregate, plot)
+used by 01_download.py and 02_data_cleanining.py. pandas, pyarrow,
+matplotlib, seaborn and plotly are imported inside the commands that use
+them, so 'years' and 'stats' start without loading any of them.
+"""
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path("data/raw")
+OUT_DIR = Path("data/processed")
+FIGURES_DIR = Path("data/figures")
+# same locations as raw_cache.CACHE_DIR, hourly_store.HOURLY_DIR and
+# instrument.STATS_DIR, repeated
+# here so the quick commands do not import pandas
+CACHE_DIR = Path("data/cache")
+HOURLY_DIR = Path("data/hourly")
+STATS_FILE = Path("data/stats/stages.jsonl")
+
+YEARS = (2015, 2018, 2021, 2024)
+DEFAULT_CITIES = ("Warszawa", "Katowice")
+
+
+# -------------------- commands --------------------
+
+def download(years=YEARS, pollutants=("PM25",), periods=("1g",), data_dir=DATA_DIR,
+             recorder=None):
+    """
+    Fetches the GIOŚ archives of 'years' and streams every (pollutant,
+    period) sheet into the typed Parquet cache. Returns the archive paths.
+    """
+    from downloader import download_archives
+    from instrument import StageRecorder
+    from raw_cache import load_source
+    from sources import registry
+
+    recorder = recorder or StageRecorder()
+    sources = registry(list(years), pollutants=pollutants, periods=periods)
+
+    # archives are fetched concurrently; unchanged ones are not downloaded again
+    with recorder.stage("download") as record:
+        archives = download_archives(
+            {source.year: source.url for source in sources},
+            Path(data_dir) / "archives",
+            workers=len(years)
+        )
+        record["rows_out"] = len(archives)
+
+    # sheets are streamed straight into the typed Parquet cache
+    for source in sources:
+        clean = recorder.call(f"ingest/{source.name}", load_source, source, archives[source.year])
+        logger.info(f"{source.name} columns:{list(clean.columns)}")
+    return archives
+
+
+def _write_tables(tables, out_dir, csv=False):
+    from processed import write_table
+
+    for name in ("monthly_PM25", "df_ex2", "df_ex4"):
+        write_table(tables[name], name, out_dir, csv=csv)
+
+
+def clean(years=YEARS, data_dir=DATA_DIR, out_dir=OUT_DIR, workers=None, min_coverage=None,
+          chunked=False, chunk_hours=24 * 31, profile=(), recorder=None, hourly_dir=HOURLY_DIR,
+          csv=False, station_policy="intersection", min_years=None):
+    """
+    Runs the cleaning pipeline and writes data/processed: the daily cube,
+    monthly_PM25, df_ex2, df_ex4 and, outside the chunked mode,
+    cleaned_and_combined as Parquet (plus CSV copies with csv=True), and
+    the memory-mapped hourly cubes in hourly_dir. station_policy and
+    min_years choose the stations kept across years (see
+    stations.align_stations). Returns the pipeline results.
+    """
+    from aggregate import DAILY_CUBE, write_daily_cube
+    from hourly_store import write_cube
+    from instrument import StageRecorder
+    from pipeline import build_cleaning_pipeline, stream_cleaning
+    from processed import table_path, write_table
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    metadata_path = Path(data_dir) / "Metadata.xlsx"
+    recorder = recorder or StageRecorder(profile=profile)
+
+    if chunked:
+        results = stream_cleaning(years, data_dir, metadata_path, chunk_hours=chunk_hours,
+                                  min_coverage=min_coverage, recorder=recorder,
+                                  station_policy=station_policy, min_years=min_years)
+        with recorder.stage("write", rows_in=len(results["daily"])):
+            write_daily_cube(results["daily"], out_dir / DAILY_CUBE)
+            _write_tables(results, out_dir, csv)
+        return results
+
+    # every stage is cached in data/cache under a hash of its inputs, so
+    # only stages affected by a changed raw file or metadata are recomputed
+    pipe = build_cleaning_pipeline(years, data_dir, metadata_path,
+                                   min_coverage=min_coverage, recorder=recorder,
+                                   station_policy=station_policy, min_years=min_years)
+    cubes = {year: f"cube/{year}" for year in years}
+    results = pipe.run(
+        ["combined", "daily", "monthly_PM25", "df_ex2", "df_ex4", *cubes.values()],
+        workers=workers or min(len(years), os.cpu_count() or 1)
+    )
+    logger.info(f"Przeliczone etapy: {pipe.computed or 'brak (wszystko z cache)'}")
+
+    combined = [table_path("cleaned_and_combined", out_dir, suffix)
+                for suffix in (".parquet", ".csv")[:1 + csv]]
+    with recorder.stage("write", rows_in=len(results["combined"])) as record:
+        if "combined" in pipe.computed or not all(path.exists() for path in combined):
+            write_table(results["combined"], "cleaned_and_combined", out_dir, csv=csv)
+        if "aggregates" in pipe.computed or not (out_dir / DAILY_CUBE).exists():
+            write_daily_cube(results["daily"], out_dir / DAILY_CUBE)
+        # hourly station x hour blocks for queries over single stations or dates
+        for year, name in cubes.items():
+            if name in pipe.computed or not _stored(hourly_dir, year):
+                write_cube(results[name], hourly_dir)
+        _write_tables(results, out_dir, csv)
+        record["rows_out"] = sum(len(results[n]) for n in ("monthly_PM25", "df_ex2", "df_ex4"))
+    return results
+
+
+def _stored(hourly_dir, year, pollutant="PM25"):
+    return (Path(hourly_dir) / f"{year}_{pollutant}.json").exists()
+
+
+def aggregate(threshold, min_coverage=None, out_dir=None, cube_path=OUT_DIR / "daily_PM25.parquet",
+              csv=False):
+    """
+    Recomputes monthly_PM25, df_ex2 and df_ex4 from the daily cube for
+    another threshold or coverage rule, without the hourly data. Writes
+    to out_dir (default data/processed/threshold_<t>).
+    """
+    from aggregate import cube_tables, read_daily_cube
+
+    out_dir = Path(out_dir or OUT_DIR / f"threshold_{threshold:g}")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tables = cube_tables(read_daily_cube(cube_path), threshold=threshold,
+                         min_coverage=min_coverage)
+    _write_tables(tables, out_dir, csv)
+    return tables
+
+
+def plot(kind, out_dir=FIGURES_DIR, processed_dir=OUT_DIR, threshold=None, year=2024,
+         top_n=3, cities=None, metadata_path=DATA_DIR / "Metadata.xlsx", per_page=None,
+         file_format="png", workers=None):
+    """
+    Renders one figure from the tables in data/processed:
+    'exceeded' (plotly, HTML; any threshold through the daily cube),
+    'trends', 'heatmaps' and 'voivodeships' (matplotlib, PNG).
+    cities default to Warszawa and Katowice. With per_page, 'heatmaps'
+    renders every city (or 'cities') into pages of per_page panels in
+    out_dir/heatmaps using 'workers' processes.
+    Returns the written path.
+    """
+    from processed import read_table
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    processed_dir = Path(processed_dir)
+
+    if kind == "exceeded":
+        from aggregate import read_daily_cube
+        from exceedance import ExceedanceIndex
+        from visualizations import plot_exceeded_days_top_bottom
+
+        index = ExceedanceIndex.from_daily(read_daily_cube(processed_dir / "daily_PM25.parquet"))
+        fig = plot_exceeded_days_top_bottom(index, year=year, top_n=top_n, threshold=threshold)
+        path = out_dir / "exceeded_days.html"
+        fig.write_html(path)
+        return path
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    if kind == "trends":
+        from means import make_trend_df
+        from visualizations import plot_city_trends
+
+        cities = cities or DEFAULT_CITIES
+        df_ex2 = read_table("df_ex2", processed_dir, cities=cities)
+        fig = plot_city_trends(make_trend_df(df_ex2), cities=cities)
+    elif kind == "heatmaps":
+        from means import prepare_ex3_heatmap_df
+        from visualizations import plot_city_heatmaps
+
+        # every city is needed only for the pages of all cities
+        wanted = cities if cities or per_page else DEFAULT_CITIES
+        monthly = read_table("monthly_PM25", processed_dir, columns=["city", "year", "month", "PM2.5"],
+                             cities=wanted)
+        df_ex3 = prepare_ex3_heatmap_df(monthly)
+        if per_page:
+            from visualizations import render_heatmaps
+
+            render_heatmaps(df_ex3, out_dir / "heatmaps", cities=cities, per_page=per_page,
+                            file_format=file_format, workers=workers)
+            return out_dir / "heatmaps"
+        fig = plot_city_heatmaps(df_ex3, cities=list(cities or DEFAULT_CITIES),
+                                 years=sorted(df_ex3["year"].unique()))
+    elif kind == "voivodeships":
+        from means import prepare_voivodeship_stats
+        from stations import load_station_index
+        from visualizations import plot_voivodeship_stats
+
+        df_ex4 = read_table("df_ex4", processed_dir, columns=["year", "station", "exceeded"])
+        fig = plot_voivodeship_stats(
+            prepare_voivodeship_stats(df_ex4, load_station_index(metadata_path))
+        )
+    else:
+        raise ValueError(f"Unknown plot {kind!r}")
+
+    path = out_dir / f"{kind}.png"
+    fig.savefig(path, dpi=150)
+    return path
+
+
+# -------------------- quick commands (no pandas) --------------------
+
+def cached_datasets(cache_dir=CACHE_DIR):
+    """(dataset, size in bytes) of the typed Parquet cache, e.g. ('2018_PM25_1g', ...)."""
+    datasets = []
+    for path in Path(cache_dir).glob("clean*.parquet"):
+        # clean2018-<key>.parquet (CSV source) or clean-2018_PM25_1g-<key>.parquet
+        name = path.stem.removeprefix("clean").removeprefix("-").rsplit("-", 1)[0]
+        datasets.append((name, path.stat().st_size))
+    return sorted(datasets)
+
+
+def stored_cubes(hourly_dir=HOURLY_DIR):
+    """(year_pollutant, stations, hours) of the hourly store, from the JSON headers."""
+    cubes = []
+    for path in sorted(Path(hourly_dir).glob("*.json")):
+        n_stations, n_hours = json.loads(path.read_text(encoding="utf-8"))["shape"]
+        cubes.append((path.stem, n_stations, n_hours))
+    return cubes
+
+
+def stage_summary(stats_file=STATS_FILE, run=None):
+    """Records of one run (default: the latest) from the stage stats file."""
+    records = [json.loads(line) for line in Path(stats_file).read_text().splitlines() if line]
+    if not records:
+        return []
+    run = run or records[-1]["run"]
+    return [r for r in records if r["run"] == run]
+
+
+# -------------------- entry point --------------------
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="GIOŚ PM2.5 workflow")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("download", help="fetch archives and build the cache")
+    p.add_argument("--years", type=int, nargs="+", default=list(YEARS))
+    p.add_argument("--pollutants", nargs="+", default=["PM25"])
+    p.add_argument("--periods", nargs="+", default=["1g"])
+
+    p = commands.add_parser("clean", help="run the cleaning pipeline")
+    p.add_argument("--years", type=int, nargs="+", default=list(YEARS))
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--min-coverage", type=float, default=None)
+    p.add_argument("--chunked", action="store_true", help="out-of-core mode")
+    p.add_argument("--chunk-hours", type=int, default=24 * 31)
+    p.add_argument("--profile", nargs="*", default=(), help="stages to run under cProfile")
+    p.add_argument("--csv", action="store_true", help="also write the tables as CSV")
+    p.add_argument("--stations", default="intersection",
+                   choices=["intersection", "union", "min_years"],
+                   help="stations kept across years")
+    p.add_argument("--min-years", type=int, default=None,
+                   help="with --stations min_years: years a station needs data in")
+
+    p = commands.add_parser("aggregate", help="recompute tables from the daily cube")
+    p.add_argument("--threshold", type=float, required=True)
+    p.add_argument("--min-coverage", type=float, default=None)
+    p.add_argument("--out", type=Path, default=None)
+    p.add_argument("--csv", action="store_true", help="also write the tables as CSV")
+
+    p = commands.add_parser("plot", help="render a figure from data/processed")
+    p.add_argument("kind", choices=["exceeded", "trends", "heatmaps", "voivodeships"])
+    p.add_argument("--threshold", type=float, default=None)
+    p.add_argument("--year", type=int, default=2024)
+    p.add_argument("--top-n", type=int, default=3)
+    p.add_argument("--cities", nargs="+", default=None)
+    p.add_argument("--per-page", type=int, default=None,
+                   help="heatmaps of all cities (or --cities), this many per file")
+    p.add_argument("--format", default="png", choices=["png", "svg", "pdf"])
+    p.add_argument("--workers", type=int, default=None)
+
+    commands.add_parser("years", help="list cached years and downloaded archives")
+
+    p = commands.add_parser("stats", help="stage timings of the latest run")
+    p.add_argument("--run", default=None)
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s | %(levelname)s | %(message)s"
+    )
+
+    if args.command == "download":
+        download(args.years, args.pollutants, args.periods)
+    elif args.command == "clean":
+        clean(args.years, workers=args.workers, min_coverage=args.min_coverage,
+              chunked=args.chunked, chunk_hours=args.chunk_hours, profile=args.profile,
+              csv=args.csv, station_policy=args.stations, min_years=args.min_years)
+    elif args.command == "aggregate":
+        tables = aggregate(args.threshold, args.min_coverage, args.out, csv=args.csv)
+        print(f"{len(tables['df_ex4'])} stacjo-lat, próg {args.threshold:g} µg/m³")
+    elif args.command == "plot":
+        print(plot(args.kind, threshold=args.threshold, year=args.year, top_n=args.top_n,
+                   cities=args.cities, per_page=args.per_page, file_format=args.format,
+                   workers=args.workers))
+    elif args.command == "years":
+        for name, size in cached_datasets():
+            print(f"cache    {name:<20} {size / 2**20:8.2f} MiB")
+        for path in sorted((DATA_DIR / "archives").glob("*.zip")):
+            print(f"archive  {path.stem:<20} {path.stat().st_size / 2**20:8.2f} MiB")
+        for name, stations, hours in stored_cubes():
+            print(f"hourly   {name:<20} {stations:>4} stacji x {hours} godz.")
+    elif args.command == "stats":
+        if not STATS_FILE.exists():
+            print(f"Brak {STATS_FILE}")
+            return 1
+        for r in stage_summary(run=args.run):
+            print(f"{r['stage']:<24} {r['wall_s']:9.3f} s {r['cpu_s']:9.3f} s CPU "
+                  f"{r['rows_out'] if r['rows_out'] is not None else '-':>10} rows "
+                  f"{r['peak_rss_mib'] or 0:8.1f} MiB")
+    return 0
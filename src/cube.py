@@ -0,0 +1,267 @@
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from aggregate import HOURS_PER_DAY, WHO_DAILY_LIMIT, tables_from_daily
+from stations import align_stations, as_station_index
+from timestamps import HOUR, days_in_year, hour_slots, parse_timestamps, year_start
+from utils import assign_measurement_day, station_dictionary, to_float32_columns, unify_categories
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PM25Cube:
+    """
+    Hourly PM2.5 of one year as a dense float32 stations x hours matrix.
+
+    values[i, h] is the reading of stations[i] in hour slot h (see
+    hour_slots); missing hours are NaN and cities[i] is the city of the
+    station. Measurement day d (midnight readings belong to the previous
+    day) is exactly columns 24d .. 24d + 23, so daily, monthly and yearly
+    statistics are reshapes and reductions over the hour axis instead of
+    melt and groupby.
+    """
+    year: int
+    stations: pd.Index
+    cities: np.ndarray
+    values: np.ndarray
+
+    @classmethod
+    def from_wide(cls, wide, year, metadata):
+        """
+        Builds the cube from a clean wide frame ('Datetime' plus one column
+        per station, codes already normalized). Rows are placed on the
+        hour grid by their timestamp, so gaps stay NaN; rows off the grid
+        are dropped and, for a repeated hour, the last row is kept.
+        Duplicated station columns are averaged.
+        """
+        stations = as_station_index(metadata)
+        readings = to_float32_columns(wide.drop(columns="Datetime"), skip=())
+        readings.columns = readings.columns.astype(str)
+        if readings.columns.has_duplicates:
+            logger.warning(f"{year}: powtórzone kolumny stacji, uśredniono odczyty")
+            readings = readings.T.groupby(level=0, sort=False).mean().T
+
+        slots = hour_slots(wide["Datetime"], year)
+        on_grid = slots >= 0
+        if not on_grid.all():
+            logger.warning(f"{year}: {(~on_grid).sum()} wierszy poza siatką godzinową pominięto")
+
+        codes = pd.Index(readings.columns)
+        values = np.full((len(codes), days_in_year(year) * HOURS_PER_DAY), np.nan,
+                         dtype=np.float32)
+        values[:, slots[on_grid]] = readings.to_numpy(dtype=np.float32)[on_grid].T
+        return cls(year, codes, stations.city(codes), values)
+
+    @classmethod
+    def from_long(cls, long, year=None):
+        """
+        Builds the cube from a long frame (Datetime, station, PM2.5 and
+        optionally city), e.g. the output of utils.to_long and add_city.
+        """
+        times = parse_timestamps(long["Datetime"])
+        year = year or int(pd.Series(times.year).mode().iloc[0])
+        codes, stations = pd.factorize(long["station"].astype(str), sort=False)
+        slots = hour_slots(times, year)
+        keep = (slots >= 0) & (codes >= 0)
+
+        values = np.full((len(stations), days_in_year(year) * HOURS_PER_DAY), np.nan,
+                         dtype=np.float32)
+        values[codes[keep], slots[keep]] = long["PM2.5"].to_numpy(dtype=np.float32)[keep]
+
+        cities = np.full(len(stations), np.nan, dtype=object)
+        if "city" in long:
+            cities[codes[keep]] = long["city"].to_numpy(dtype=object)[keep]
+        return cls(year, pd.Index(stations), cities, values)
+
+    # ---- axes ----
+
+    @property
+    def n_days(self):
+        return self.values.shape[1] // HOURS_PER_DAY
+
+    @property
+    def hours(self):
+        """End-of-hour timestamps of the hour slots."""
+        return pd.DatetimeIndex(year_start(self.year) + HOUR * np.arange(1, self.values.shape[1] + 1))
+
+    @property
+    def days(self):
+        return pd.DatetimeIndex(np.datetime64(f"{self.year}-01-01", "D") + np.arange(self.n_days))
+
+    @property
+    def stations_with_data(self):
+        """Stations with at least one reading in the year."""
+        return self.stations[~np.isnan(self.values).all(axis=1)]
+
+    @property
+    def day_months(self):
+        """Month (1-12) of every measurement day."""
+        return self.days.month.to_numpy()
+
+    def select(self, stations):
+        """Cube of the given stations, in that order (all-NaN rows for unknown ones)."""
+        idx = self.stations.get_indexer(pd.Index(stations).astype(str))
+        values = np.where((idx >= 0)[:, None], self.values[idx], np.nan).astype(np.float32)
+        cities = np.where(idx >= 0, self.cities[idx], np.nan)
+        return PM25Cube(self.year, pd.Index(stations).astype(str), cities, values)
+
+    # ---- statistics ----
+
+    def daily_sums(self):
+        """Sums (float64) and counts of valid readings, stations x days."""
+        blocks = self.values.reshape(len(self.stations), self.n_days, HOURS_PER_DAY)
+        counts = np.count_nonzero(~np.isnan(blocks), axis=2)
+        sums = np.nansum(blocks.astype(np.float64), axis=2)
+        return sums, counts
+
+    def _valid_days(self, counts, min_coverage):
+        if min_coverage is None:
+            return counts > 0
+        return (counts > 0) & (counts >= min_coverage * HOURS_PER_DAY)
+
+    def daily_means(self, min_coverage=None):
+        """float32 stations x days; NaN for days without (enough) readings."""
+        sums, counts = self.daily_sums()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (sums / counts).astype(np.float32)
+        return np.where(self._valid_days(counts, min_coverage), means, np.nan)
+
+    def monthly_means(self, min_coverage=None):
+        """
+        float32 stations x 12 hourly-weighted means of the valid days, as in
+        aggregate.tables_from_daily; NaN for months without data or, with
+        min_coverage, with too few valid days.
+        """
+        sums, counts = self.daily_sums()
+        valid = self._valid_days(counts, min_coverage)
+        starts = np.flatnonzero(np.diff(self.day_months, prepend=0))
+
+        month_sums = np.add.reduceat(sums * valid, starts, axis=1)
+        month_counts = np.add.reduceat(counts * valid, starts, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (month_sums / month_counts).astype(np.float32)
+        keep = month_counts > 0
+        if min_coverage is not None:
+            days = np.diff(np.append(starts, self.n_days))
+            keep &= np.add.reduceat(valid, starts, axis=1) >= min_coverage * days
+        return np.where(keep, means, np.nan)
+
+    def exceedance_counts(self, threshold=WHO_DAILY_LIMIT, min_coverage=None):
+        """Days per station with a (valid) daily mean above threshold."""
+        means = self.daily_means(min_coverage)
+        with np.errstate(invalid="ignore"):
+            return np.count_nonzero(means > threshold, axis=1)
+
+    def city_means(self, monthly=None):
+        """
+        Cities and their cities x 12 monthly means: the mean over the
+        city's stations of their monthly means, as for df_ex2.
+        """
+        monthly = self.monthly_means() if monthly is None else monthly
+        codes, cities = pd.factorize(pd.Series(self.cities, dtype=object), sort=True)
+        known = codes >= 0
+        totals = np.zeros((len(cities), 12))
+        counts = np.zeros((len(cities), 12))
+        np.add.at(totals, codes[known], np.nan_to_num(monthly[known]))
+        np.add.at(counts, codes[known], ~np.isnan(monthly[known]))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return pd.Index(cities), (totals / counts).astype(np.float32)
+
+    # ---- converters ----
+
+    def daily_frame(self, stations=None):
+        """
+        Observed station-days in the format of aggregate.daily_sums (year,
+        station, city, date, sum, count), ready for tables_from_daily.
+        'stations' are the station categories (default: the cube's).
+        """
+        sums, counts = self.daily_sums()
+        known = pd.notna(self.cities)
+        station_idx, day_idx = np.nonzero(counts * known[:, None])
+
+        categories = self.stations if stations is None else pd.Index(stations)
+        city_codes, city_names = pd.factorize(pd.Series(self.cities, dtype=object), sort=True)
+        return pd.DataFrame({
+            "year": np.full(len(station_idx), self.year, dtype=np.int16),
+            "station": pd.Categorical.from_codes(
+                categories.get_indexer(self.stations[station_idx]), categories=categories
+            ),
+            "city": pd.Categorical.from_codes(city_codes[station_idx], categories=city_names),
+            "date": self.days[day_idx].to_numpy("datetime64[us]"),
+            "sum": sums[station_idx, day_idx],
+            "count": counts[station_idx, day_idx].astype(np.int32),
+        })
+
+    def to_long(self, stations=None):
+        """
+        Long frame (Datetime, station, PM2.5, city, year) in the layout of
+        the per-year pipeline stages: one block of hours per station,
+        NaN readings included. 'stations' are the station categories
+        (default: the cube's).
+        """
+        n_stations, n_hours = self.values.shape
+        categories = self.stations if stations is None else pd.Index(stations)
+        city_codes, city_names = pd.factorize(pd.Series(self.cities, dtype=object), sort=True)
+        return pd.DataFrame({
+            "Datetime": np.tile(self.hours.to_numpy("datetime64[us]"), n_stations),
+            "station": pd.Categorical.from_codes(
+                np.repeat(categories.get_indexer(self.stations), n_hours), categories=categories
+            ),
+            "PM2.5": self.values.ravel(),
+            "city": pd.Categorical.from_codes(np.repeat(city_codes, n_hours), categories=city_names),
+            "year": np.full(n_stations * n_hours, self.year, dtype=np.int16),
+        })
+
+
+# -------------------- several years --------------------
+
+def common_stations(cubes, policy="intersection", min_years=None):
+    """
+    Cubes restricted to the stations kept by stations.align_stations
+    (by default those with readings in every year); a station whose row
+    is all NaN in a year does not count as present in it.
+    """
+    axes = {cube.year: cube.stations_with_data for cube in cubes}
+    kept = align_stations(axes, policy, min_years).stations
+    return [cube.select(cube.stations[cube.stations.isin(kept)]) for cube in cubes]
+
+
+def _categories(cubes):
+    return pd.Index(sorted(set().union(*(cube.stations for cube in cubes))))
+
+
+def combine_cubes(metadata, *cubes, station_policy="intersection", min_years=None):
+    """
+    The hourly long 'combined' frame of all years (stations kept by
+    common_stations, measurement days assigned), rebuilt from the cubes.
+    """
+    cubes = common_stations(list(cubes), station_policy, min_years)
+    dictionary = station_dictionary(metadata)
+    categories = dictionary.append(_categories(cubes).difference(dictionary, sort=False))
+
+    frames = [cube.to_long(categories) for cube in cubes]
+    frames = unify_categories(frames, "city")
+    combined = pd.concat(frames, ignore_index=True)
+    combined = combined.dropna(subset=["PM2.5"])
+    # midnight readings belong to the previous day
+    combined = assign_measurement_day(combined)
+    return combined.drop(columns=["Datetime"])
+
+
+def aggregate_cubes(*cubes, threshold=WHO_DAILY_LIMIT, cities=("Warszawa", "Katowice"),
+                    min_coverage=None, station_policy="intersection", min_years=None):
+    """
+    aggregate.aggregate_all computed from the yearly cubes: the daily sums
+    come from reshapes of the stations x hours matrices, so the hourly
+    long frame is never built.
+    """
+    cubes = common_stations(list(cubes), station_policy, min_years)
+    categories = _categories(cubes)
+    frames = [cube.daily_frame(categories) for cube in cubes]
+    frames = unify_categories(frames, "city")
+    return tables_from_daily(pd.concat(frames, ignore_index=True), threshold, cities,
+                             min_coverage)
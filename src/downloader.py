@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path("data/raw/archives")
+
+CHUNK_SIZE = 1 << 16
+
+
+def make_session(pool_size=8, retries=3):
+    """Session with a connection pool shared by all download threads."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("HEAD", "GET"),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _meta_path(dest):
+    return dest.with_name(dest.name + ".json")
+
+
+def _part_path(dest):
+    return dest.with_name(dest.name + ".part")
+
+
+def _remote_info(session, url, timeout):
+    """ETag and size announced by the server; empty if HEAD is unsupported."""
+    try:
+        response = session.head(url, allow_redirects=True, timeout=timeout)
+    except requests.RequestException:
+        return {}
+    if not response.ok:
+        return {}
+
+    size = response.headers.get("Content-Length")
+    return {
+        "etag": response.headers.get("ETag"),
+        "size": int(size) if size is not None else None,
+    }
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_current(dest, remote):
+    """True when dest is complete and matches the server's ETag/size."""
+    meta_path = _meta_path(dest)
+    if not dest.exists() or not meta_path.exists() or not remote:
+        return False
+
+    meta = json.loads(meta_path.read_text())
+    if remote.get("etag") and remote["etag"] != meta.get("etag"):
+        return False
+    if remote.get("size") is not None and remote["size"] != meta.get("size"):
+        return False
+    return dest.stat().st_size == meta.get("size") and _sha256(dest) == meta.get("sha256")
+
+
+def _stream_to_part(session, url, part, etag, size, timeout):
+    """Downloads into the .part file, resuming with a Range request if possible."""
+    offset = part.stat().st_size if part.exists() else 0
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if etag:
+            headers["If-Range"] = etag
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # nothing left to fetch - but only trust the part file when its
+            # size matches the body the server announced
+            if size is not None and offset == size:
+                return response.headers.get("ETag", etag)
+            logger.info(f"Niepełny plik {part.name} ({offset} B), pobieranie {url} od początku")
+            part.unlink()
+            return _stream_to_part(session, url, part, etag, size, timeout)
+        response.raise_for_status()
+
+        mode = "ab" if response.status_code == 206 else "wb"
+        if offset and mode == "wb":
+            logger.info(f"Serwer nie obsługuje wznowienia, pobieranie {url} od początku")
+
+        with open(part, mode) as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+
+        return response.headers.get("ETag", etag)
+
+
+def fetch_archive(session, url, dest, retries=3, timeout=60):
+    """
+    Streams url to dest and returns dest.
+
+    The body goes to a '.part' file first, so an interrupted transfer is
+    resumed with an HTTP Range request on the next attempt. A '.json'
+    sidecar stores the ETag, size and SHA-256 of the finished file; when
+    the server still reports the same ETag and size, the download is
+    skipped entirely.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    remote = _remote_info(session, url, timeout)
+    if _is_current(dest, remote):
+        logger.info(f"Archiwum {dest.name} aktualne, pomijam pobieranie")
+        return dest
+
+    part = _part_path(dest)
+    etag = remote.get("etag")
+    for attempt in range(1, retries + 2):
+        try:
+            etag = _stream_to_part(session, url, part, etag, remote.get("size"), timeout)
+            break
+        except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt > retries:
+                raise
+            logger.warning(f"Przerwane pobieranie {url} (próba {attempt}): {e}")
+
+    part.replace(dest)
+    _meta_path(dest).write_text(json.dumps({
+        "url": url,
+        "etag": etag,
+        "size": dest.stat().st_size,
+        "sha256": _sha256(dest),
+    }))
+    logger.info(f"Pobrano {dest.name} ({dest.stat().st_size} B)")
+    return dest
+
+
+def download_archives(urls, dest_dir=ARCHIVE_DIR, workers=4, session=None):
+    """
+    Fetches several archives concurrently over one pooled session.
+
+    'urls' maps a key (e.g. the year) to a URL; the result maps the same
+    keys to local ZIP paths named '<key>.zip'.
+    """
+    dest_dir = Path(dest_dir)
+    own_session = session is None
+    if own_session:
+        session = make_session(pool_size=workers)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                key: pool.submit(fetch_archive, session, url, dest_dir / f"{key}.zip")
+                for key, url in urls.items()
+            }
+            return {key: future.result() for key, future in futures.items()}
+    finally:
+        if own_session:
+            session.close()
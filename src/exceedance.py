@@ -0,0 +1,119 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from aggregate import HOURS_PER_DAY, WHO_DAILY_LIMIT
+
+
+@dataclass
+class ExceedanceIndex:
+    """
+    Daily means of every station-year, pre-sorted for threshold queries.
+
+    'keys' holds one row per station-year (year, station, city);
+    values[offsets[i]:offsets[i + 1]] are the ascending daily means of
+    keys row i. The number of days above a threshold is the length of a
+    group minus the position of the threshold in it, found by binary
+    search, so any threshold (or a sweep of them) is answered without
+    touching the daily cube again.
+
+    The binary search runs once over all groups: every value gets a
+    uint64 search key (group code in the high 32 bits, the float32 bits
+    mapped to an order-preserving integer in the low 32 bits), which is
+    globally sorted because the values are sorted within each group.
+    """
+    keys: pd.DataFrame
+    values: np.ndarray
+    offsets: np.ndarray
+    search_keys: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        groups = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.uint64),
+                           np.diff(self.offsets))
+        self.search_keys = (groups << np.uint64(32)) | _ordered_bits(self.values)
+
+    @classmethod
+    def from_daily(cls, daily, min_coverage=None):
+        """
+        Builds the index from the daily cube (aggregate 'daily' table);
+        with min_coverage only days with enough valid hours are indexed,
+        but every station-year keeps its (possibly empty) group, as in
+        df_ex4.
+        """
+        group_codes, keys = _station_years(daily[["year", "station", "city"]])
+        means = daily["PM2.5"].to_numpy(dtype=np.float32)
+        if min_coverage is not None:
+            enough = (daily["n_hours"] >= min_coverage * HOURS_PER_DAY).to_numpy()
+            group_codes, means = group_codes[enough], means[enough]
+
+        order = np.lexsort((means, group_codes))
+        sizes = np.bincount(group_codes, minlength=len(keys))
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        return cls(keys, means[order], offsets)
+
+    def _select(self, years=None, stations=None):
+        mask = np.ones(len(self.keys), dtype=bool)
+        if years is not None:
+            mask &= self.keys["year"].isin(np.atleast_1d(years)).to_numpy()
+        if stations is not None:
+            mask &= self.keys["station"].isin(np.atleast_1d(stations)).to_numpy()
+        return np.flatnonzero(mask)
+
+    def _counts(self, groups, thresholds):
+        """Days above each threshold: array of shape (len(groups), len(thresholds))."""
+        bits = _ordered_bits(_float32_floor(thresholds))
+        queries = (groups.astype(np.uint64)[:, None] << np.uint64(32)) | bits[None, :]
+        positions = np.searchsorted(self.search_keys, queries, side="right")
+        return self.offsets[groups + 1][:, None] - positions
+
+    def exceedance_counts(self, threshold=WHO_DAILY_LIMIT, years=None, stations=None):
+        """
+        Days with a daily mean above threshold per station and year, in
+        the df_ex4 layout (year, station, city, exceeded, n_days).
+        """
+        groups = self._select(years, stations)
+        out = self.keys.iloc[groups].reset_index(drop=True)
+        out["exceeded"] = self._counts(groups, [threshold])[:, 0]
+        out["n_days"] = np.diff(self.offsets)[groups].astype(np.int16)
+        return out
+
+    def exceedance_curve(self, thresholds, years=None, stations=None):
+        """exceedance_counts for a sweep of thresholds, one row per station-year and threshold."""
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        groups = self._select(years, stations)
+        counts = self._counts(groups, thresholds)
+
+        out = self.keys.iloc[np.repeat(groups, len(thresholds))].reset_index(drop=True)
+        out["threshold"] = np.tile(thresholds, len(groups))
+        out["exceeded"] = counts.ravel()
+        return out
+
+
+def _ordered_bits(values):
+    """float32 values as uint32 integers that sort in the same order (-0.0 counts as 0.0)."""
+    bits = (np.asarray(values, dtype=np.float32) + np.float32(0)).view(np.uint32).astype(np.uint64)
+    negative = bits >= 0x80000000
+    return np.where(negative, ~bits & 0xFFFFFFFF, bits | 0x80000000)
+
+
+def _float32_floor(thresholds):
+    """
+    Largest float32 not above each threshold, so that v > floor(t) for a
+    float32 v exactly when v > t, as with the float64 comparison.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    with np.errstate(over="ignore"):
+        rounded = thresholds.astype(np.float32)
+    above = rounded > thresholds
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _station_years(keys):
+    """Integer code per row and the unique (year, station, city) rows in sorted order."""
+    unique = keys.drop_duplicates().sort_values(["year", "station"], ignore_index=True)
+    codes = pd.MultiIndex.from_frame(unique[["year", "station"]]).get_indexer(
+        pd.MultiIndex.from_frame(keys[["year", "station"]])
+    )
+    return codes, unique
@@ -0,0 +1,172 @@
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cube import HOUR, PM25Cube
+
+logger = logging.getLogger(__name__)
+
+HOURLY_DIR = Path("data/hourly")
+
+# bump when the block layout or the header fields change
+STORE_VERSION = 1
+
+
+def _block_path(root, year, pollutant):
+    return Path(root) / f"{year}_{pollutant}.npy"
+
+
+def _header_path(root, year, pollutant):
+    return Path(root) / f"{year}_{pollutant}.json"
+
+
+def write_cube(cube, root=HOURLY_DIR, pollutant="PM25"):
+    """
+    Stores a PM25Cube as <year>_<pollutant>.npy (the float32 stations x
+    hours block, one station per contiguous row) plus a JSON header with
+    the station and city axes. Both files are replaced atomically.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    block, header = _block_path(root, cube.year, pollutant), _header_path(root, cube.year, pollutant)
+
+    tmp = block.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(cube.values, dtype=np.float32))
+    tmp.replace(block)
+
+    meta = {
+        "version": STORE_VERSION,
+        "year": cube.year,
+        "pollutant": pollutant,
+        "shape": list(cube.values.shape),
+        "first_hour": str(cube.hours[0]),
+        "stations": [str(s) for s in cube.stations],
+        "cities": [None if pd.isna(c) else str(c) for c in cube.cities],
+    }
+    tmp = header.with_suffix(".tmp")
+    tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(header)
+
+    logger.info(f"Zapisano blok godzinowy {block} {cube.values.shape}")
+    return block
+
+
+def read_header(root, year, pollutant="PM25"):
+    return json.loads(_header_path(root, year, pollutant).read_text(encoding="utf-8"))
+
+
+def open_cube(year, root=HOURLY_DIR, pollutant="PM25"):
+    """
+    The stored PM25Cube of a year with 'values' memory-mapped read-only:
+    nothing is read until it is sliced, and slices are views of the file.
+    """
+    meta = read_header(root, year, pollutant)
+    if meta["version"] != STORE_VERSION:
+        raise ValueError(f"{year}_{pollutant}: wersja magazynu {meta['version']}, "
+                         f"oczekiwano {STORE_VERSION}")
+    values = np.load(_block_path(root, year, pollutant), mmap_mode="r")
+    if list(values.shape) != meta["shape"]:
+        raise ValueError(f"{year}_{pollutant}: blok {values.shape} niezgodny z nagłówkiem")
+    cities = np.array([np.nan if c is None else c for c in meta["cities"]], dtype=object)
+    return PM25Cube(meta["year"], pd.Index(meta["stations"]), cities, values)
+
+
+@dataclass
+class HourlyStore:
+    """
+    Memory-mapped hourly cubes of all years and pollutants under 'root'.
+
+    Questions about a few stations or a date range over many years only
+    touch the rows and hour ranges they need: a station is one contiguous
+    row of each year's block, a date range a contiguous run of columns.
+    """
+    root: Path = HOURLY_DIR
+
+    def years(self, pollutant="PM25"):
+        return sorted(
+            int(path.stem.split("_", 1)[0])
+            for path in Path(self.root).glob(f"*_{pollutant}.json")
+        )
+
+    def cube(self, year, pollutant="PM25"):
+        return open_cube(year, self.root, pollutant)
+
+    def stations(self, cities=None, years=None, pollutant="PM25"):
+        """Station codes found in any of 'years', optionally only in 'cities'."""
+        wanted = None if cities is None else set(np.atleast_1d(cities))
+        codes = {}
+        for year in years or self.years(pollutant):
+            meta = read_header(self.root, year, pollutant)
+            for station, city in zip(meta["stations"], meta["cities"]):
+                if wanted is None or city in wanted:
+                    codes.setdefault(station, None)
+        return list(codes)
+
+    def read(self, stations=None, cities=None, start=None, end=None, years=None,
+             pollutant="PM25"):
+        """
+        Hourly readings (index Datetime, one column per station) of the
+        given stations and/or cities between start and end (inclusive
+        end-of-hour timestamps), across every stored year in range.
+        Stations missing in a year are NaN there; a station named twice
+        (or also found through 'cities') gets one column.
+
+        When the range lies in one year and the stations are a contiguous
+        run of that year's rows in stored order (e.g. all of them, or a
+        single one), the frame is a read-only view of the memory-mapped
+        block; otherwise the selected rows are copied out of it.
+        """
+        selected = None if stations is None else list(np.atleast_1d(stations))
+        if cities is not None:
+            selected = (selected or []) + self.stations(cities, years, pollutant)
+        if selected is not None:
+            selected = list(dict.fromkeys(selected))
+
+        frames = []
+        for year in years or self.years(pollutant):
+            cube = self.cube(year, pollutant)
+            first, last = _hour_range(year, cube.values.shape[1], start, end)
+            if first >= last:
+                continue
+
+            columns = cube.stations if selected is None else pd.Index(selected)
+            rows = cube.stations.get_indexer(columns)
+            block = cube.values[:, first:last]
+            run = _contiguous_run(rows)
+            if run is not None:
+                values = block[run].T
+            else:
+                values = np.full((last - first, len(columns)), np.nan, dtype=np.float32)
+                values[:, rows >= 0] = block[rows[rows >= 0]].T
+            frames.append(pd.DataFrame(values, columns=columns, copy=False,
+                                       index=pd.DatetimeIndex(cube.hours[first:last],
+                                                              name="Datetime")))
+
+        if not frames:
+            return pd.DataFrame(columns=selected or [], index=pd.DatetimeIndex([], name="Datetime"))
+        return frames[0] if len(frames) == 1 else pd.concat(frames)
+
+
+def _contiguous_run(rows):
+    """slice(rows[0], rows[-1] + 1) when rows are consecutive stored rows, else None."""
+    if len(rows) == 0 or rows[0] < 0 or not (np.diff(rows) == 1).all():
+        return None
+    return slice(int(rows[0]), int(rows[-1]) + 1)
+
+
+def _hour_range(year, n_hours, start=None, end=None):
+    """Slots [first, last) of the year's grid whose end-of-hour lies in [start, end]."""
+    first, last = 0, n_hours
+    origin = np.datetime64(f"{year}-01-01T00:00", "us")
+    if start is not None:
+        offset = (np.datetime64(pd.Timestamp(start), "us") - origin) / HOUR
+        first = int(np.clip(np.ceil(offset) - 1, 0, n_hours))
+    if end is not None:
+        offset = (np.datetime64(pd.Timestamp(end), "us") - origin) / HOUR
+        last = int(np.clip(np.floor(offset), 0, n_hours))
+    return first, last
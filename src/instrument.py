@@ -0,0 +1,141 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+STATS_DIR = Path("data/stats")
+
+
+def count_rows(value):
+    """Rows of a frame, or summed over the frames in a dict/list; None otherwise."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        counts = [count_rows(v) for v in value]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    return None
+
+
+def _rss_mib():
+    """Current resident set size [MiB], if the platform exposes it."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mib():
+    """High-water mark of the process RSS [MiB]."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class StageRecorder:
+    """
+    Records wall time, CPU time, rows in/out and memory of pipeline stages.
+
+    Every stage is written as one JSON line to 'path' (and logged), e.g.
+    {"stage": "long/2018", "wall_s": 0.12, "cpu_s": 0.11, "rows_in": 8760,
+    "rows_out": 446760, "rss_mib": 410.2, "peak_rss_mib": 520.7, ...}.
+    peak_rss_mib is the process high-water mark after the stage, so a
+    stage that raised it shows a jump. Stages listed in 'profile' (or all,
+    with "*") also run under cProfile; the .prof file is written to
+    'profile_dir' for snakeviz, flameprof or gprof2dot.
+
+    The recorder only holds paths, so it is picklable and can be used by
+    pipeline workers; they append to the same file.
+    """
+
+    def __init__(self, path=STATS_DIR / "stages.jsonl", profile=(), profile_dir=STATS_DIR,
+                 run_id=None):
+        self.path = Path(path) if path else None
+        self.profile = set(profile)
+        self.profile_dir = Path(profile_dir)
+        self.run_id = run_id or datetime.now().strftime("%Y%m%dT%H%M%S")
+
+    def _profiled(self, name):
+        return "*" in self.profile or name in self.profile
+
+    def emit(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        logger.info(f"stage {line}")
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Measures the enclosed block. Yields the record dict; set
+        record["rows_out"] (or other fields) inside the block.
+        """
+        record = {"run": self.run_id, "stage": name, "pid": os.getpid(),
+                  "rows_in": rows_in, "rows_out": None}
+        profiler = cProfile.Profile() if self._profiled(name) else None
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler:
+            try:
+                profiler.enable()
+            except ValueError:
+                # an enclosing stage is already being profiled
+                profiler = None
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = repr(e)
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            record["wall_s"] = round(time.perf_counter() - wall, 6)
+            record["cpu_s"] = round(time.process_time() - cpu, 6)
+            rss, peak = _rss_mib(), _peak_rss_mib()
+            record["rss_mib"] = rss and round(rss, 1)
+            record["peak_rss_mib"] = peak and round(peak, 1)
+            if profiler:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                prof_path = self.profile_dir / f"{name.replace('/', '-')}.prof"
+                profiler.dump_stats(prof_path)
+                record["profile"] = str(prof_path)
+            self.emit(record)
+
+    def call(self, name, func, /, *args, **kwargs):
+        """Runs func under stage(name), counting rows of the frames in and out."""
+        with self.stage(name, rows_in=count_rows(list(args))) as record:
+            result = func(*args, **kwargs)
+            record["rows_out"] = count_rows(result)
+        return result
+
+    def wrap(self, name=None):
+        """Decorator form of call()."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.call(name or func.__name__, func, *args, **kwargs)
+            return wrapper
+        return decorator
@@ -1,5 +1,10 @@
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
+from stations import StationIndex
+
 # funkcja do zadania 2:
 def make_trend_df(df_ex2: pd.DataFrame, years=(2015, 2024)) -> pd.DataFrame:
     """
@@ -34,12 +39,12 @@ def trend_sanity_summary(trend_df: pd.DataFrame) -> dict:
     cities_present = sorted(trend_df["city"].dropna().unique().tolist())
 
     months_per_city_year = (
-        trend_df.groupby(["city", "year"])["month"].nunique().unstack()
+        trend_df.groupby(["city", "year"], observed=True)["month"].nunique().unstack()
         if len(trend_df) else None
     )
 
     mean_pm25_city_year = (
-        trend_df.groupby(["city", "year"])["PM2.5"].mean()
+        trend_df.groupby(["city", "year"], observed=True)["PM2.5"].mean()
         if len(trend_df) else None
     )
 
@@ -63,19 +68,63 @@ def prepare_ex3_heatmap_df(monthly_PM25: pd.DataFrame) -> pd.DataFrame:
 
     df_ex3 = (
         monthly_PM25
-        .groupby(["city", "year", "month"], as_index=False)[["PM2.5"]]
+        .groupby(["city", "year", "month"], as_index=False, observed=True)[["PM2.5"]]
         .mean()
     )
 
     return df_ex3
     
+
+@dataclass
+class HeatmapCube:
+    """
+    Monthly means of df_ex3 as one city x year x month array.
+
+    values[i, j, m - 1] is the mean of cities[i] in years[j] and month m,
+    NaN where there are no data. Built in one pass over df_ex3, so
+    heatmaps of many cities slice the array instead of filtering and
+    pivoting the frame once per city.
+    """
+    cities: list
+    years: list
+    values: np.ndarray
+
+    @classmethod
+    def from_df(cls, df_ex3, cities=None, years=None):
+        """
+        Pivots df_ex3 (city, year, month, PM2.5); cities/years default to
+        all present, listed ones without data are all-NaN.
+        """
+        if cities is None:
+            cities = sorted(df_ex3["city"].dropna().unique())
+        if years is None:
+            years = sorted(df_ex3["year"].dropna().unique())
+        cities, years = list(cities), [int(y) for y in years]
+
+        city_idx = pd.Index(cities).get_indexer(df_ex3["city"])
+        year_idx = pd.Index(years).get_indexer(df_ex3["year"])
+        month = df_ex3["month"].to_numpy(dtype=np.int64)
+        keep = (city_idx >= 0) & (year_idx >= 0) & (month >= 1) & (month <= 12)
+
+        values = np.full((len(cities), len(years), 12), np.nan)
+        values[city_idx[keep], year_idx[keep], month[keep] - 1] = (
+            df_ex3["PM2.5"].to_numpy(dtype=float)[keep]
+        )
+        return cls(cities, years, values)
+
+    def select(self, cities):
+        """Cube of the given cities in that order; cities without data are all-NaN."""
+        idx = pd.Index(self.cities).get_indexer(list(cities))
+        values = np.where((idx >= 0)[:, None, None], self.values[idx], np.nan)
+        return HeatmapCube(list(cities), self.years, values)
+
  #sanity checks:   
 def heatmap_sanity_summary(df_ex3: pd.DataFrame) -> dict:
     years_present = sorted(df_ex3["year"].dropna().unique().tolist())
     cities_present = sorted(df_ex3["city"].dropna().unique().tolist())
 
     months_per_city_year = (
-        df_ex3.groupby(["city", "year"])["month"].nunique().unstack()
+        df_ex3.groupby(["city", "year"], observed=True)["month"].nunique().unstack()
         if len(df_ex3) else None
     )
 
@@ -92,24 +141,30 @@ def heatmap_sanity_summary(df_ex3: pd.DataFrame) -> dict:
         "pm25_max": pm25_minmax[1],
     }
 # Funkcja do zadania 7
-def prepare_voivodeship_stats(df_ex4: pd.DataFrame, meta_df: pd.DataFrame) -> pd.DataFrame:
+def prepare_voivodeship_stats(df_ex4: pd.DataFrame, meta_df: pd.DataFrame | StationIndex) -> pd.DataFrame:
     """
     Łączy dane o przekroczeniach z metadanymi i liczy średnią liczbę dni
     przekroczenia normy na jedną stację w każdym województwie.
+    Zamiast ramki metadanych można podać StationIndex – wtedy województwo
+    odczytywane jest wektorowo z indeksu, bez merge.
     """
-    # merge stats with metadata
-    merged = df_ex4.merge(
-        meta_df[["Kod stacji", "Województwo"]],
-        left_on="station",
-        right_on="Kod stacji",
-        how="inner"
-    )
+    if isinstance(meta_df, StationIndex):
+        merged = df_ex4.assign(Województwo=meta_df.voivodeship(df_ex4["station"]))
+        merged = merged.dropna(subset=["Województwo"])
+    else:
+        # merge stats with metadata
+        merged = df_ex4.merge(
+            meta_df[["Kod stacji", "Województwo"]],
+            left_on="station",
+            right_on="Kod stacji",
+            how="inner"
+        )
 
     # UWAGA: usuwamy linię z sample(frac=1) — to była niespodzianka
 
     # calculate means
     stats = (
-        merged.groupby(["Województwo", "year"])["exceeded"]
+        merged.groupby(["Województwo", "year"], observed=True)["exceeded"]
         .mean()
         .reset_index()
         .rename(columns={"exceeded": "avg_exceeded_days"})
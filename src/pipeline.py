@@ -0,0 +1,307 @@
+import functools
+import hashlib
+import inspect
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from aggregate import WHO_DAILY_LIMIT, stream_aggregate
+from cube import PM25Cube, aggregate_cubes, combine_cubes
+from raw_cache import (
+    CACHE_DIR, CACHE_VERSION, file_checksum, load_clean_archive, load_clean_year
+)
+from sources import archive_filename
+from stations import load_station_index
+from utils import normalize_station_codes
+
+logger = logging.getLogger(__name__)
+
+# bump when a stage's result changes through code outside the stage
+# function itself (cube, aggregate, utils, ...); _fingerprint only sees
+# the function's own source; raw_cache.CACHE_VERSION is hashed as well,
+# since the clean stages are not pickled here
+PIPELINE_VERSION = "3"
+
+
+# -------------------- DAG runner --------------------
+
+@dataclass
+class Node:
+    name: str
+    func: Callable
+    deps: tuple = ()
+    params: dict = field(default_factory=dict)
+    files: tuple = ()
+    persist: bool = True
+    branch: bool = False
+
+
+def _fingerprint(func):
+    """
+    Source code of a stage function, so editing it invalidates its cache;
+    changes in the helpers it calls are covered by PIPELINE_VERSION only.
+    """
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return getattr(func, "__qualname__", repr(func))
+
+
+class Pipeline:
+    """
+    Small DAG runner with content-addressed caching.
+
+    A node's key hashes PIPELINE_VERSION, its function source, parameters,
+    the checksums of its input files and the keys of its upstream nodes.
+    Results of persisted nodes are pickled under that key, so a run only
+    recomputes nodes whose key changed; everything else is loaded from
+    disk, and only when a downstream node actually needs it.
+
+    Only the stage function's own source is hashed, not the helpers it
+    calls. Whenever code in cube, aggregate, utils, stations or another
+    helper module changes what a stage returns, PIPELINE_VERSION must be
+    bumped by hand, or the old pickles stay valid.
+
+    Nodes added with branch=True head independent sub-graphs (e.g. one
+    year of data); run(..., workers=n) computes stale branches in a
+    process pool before resolving the targets.
+
+    With an instrument.StageRecorder, every computed node is recorded
+    as a stage (time, rows, memory) under its node name.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR / "nodes", recorder=None):
+        self.cache_dir = Path(cache_dir)
+        self.recorder = recorder
+        self.nodes = {}
+        self.computed = []
+        self._keys = {}
+        self._values = {}
+
+    def __getstate__(self):
+        # workers get the graph and the keys, not values computed so far
+        state = self.__dict__.copy()
+        state["computed"] = []
+        state["_values"] = {}
+        return state
+
+    def add(self, name, func, deps=(), params=None, files=(), persist=True,
+            branch=False):
+        if name in self.nodes:
+            raise ValueError(f"Node {name!r} already defined")
+        for dep in deps:
+            if dep not in self.nodes:
+                raise KeyError(f"Node {name!r} depends on unknown node {dep!r}")
+
+        self.nodes[name] = Node(
+            name, func, tuple(deps), params or {}, tuple(files), persist, branch
+        )
+        return name
+
+    def ancestors(self, name):
+        found = set()
+        stack = list(self.nodes[name].deps)
+        while stack:
+            dep = stack.pop()
+            if dep not in found:
+                found.add(dep)
+                stack.extend(self.nodes[dep].deps)
+        return found
+
+    def is_cached(self, name):
+        return self.nodes[name].persist and self._path(name).exists()
+
+    def key(self, name):
+        if name not in self._keys:
+            node = self.nodes[name]
+            digest = hashlib.sha256(f"{PIPELINE_VERSION}:{CACHE_VERSION}".encode())
+            digest.update(_fingerprint(node.func).encode())
+            digest.update(repr(sorted(node.params.items())).encode())
+            for path in node.files:
+                digest.update(file_checksum(path).encode())
+            for dep in node.deps:
+                digest.update(self.key(dep).encode())
+            self._keys[name] = digest.hexdigest()
+        return self._keys[name]
+
+    def _path(self, name):
+        return self.cache_dir / f"{name.replace('/', '-')}-{self.key(name)[:16]}.pkl"
+
+    def _store(self, name, value):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(name)
+        for stale in self.cache_dir.glob(f"{name.replace('/', '-')}-*.pkl"):
+            if stale != path:
+                stale.unlink()
+        pd.to_pickle(value, path)
+
+    def get(self, name):
+        """Returns a node's value, loading or recomputing it as needed."""
+        if name in self._values:
+            return self._values[name]
+
+        node = self.nodes[name]
+        path = self._path(name)
+
+        if node.persist and path.exists():
+            value = pd.read_pickle(path)
+        else:
+            args = [self.get(dep) for dep in node.deps]
+            logger.info(f"Obliczanie węzła {name}")
+            if self.recorder is not None:
+                value = self.recorder.call(name, node.func, *args, **node.params)
+            else:
+                value = node.func(*args, **node.params)
+            self.computed.append(name)
+            if node.persist:
+                self._store(name, value)
+
+        self._values[name] = value
+        return value
+
+    def run(self, targets, workers=1):
+        if workers > 1:
+            self._run_branches(workers)
+        return {name: self.get(name) for name in targets}
+
+    def _run_branches(self, workers):
+        pending = [
+            name for name, node in self.nodes.items()
+            if node.branch and name not in self._values and not self.is_cached(name)
+        ]
+        if len(pending) < 2:
+            return
+
+        # nodes shared by several branches (e.g. metadata) are computed once
+        # here, so their caches are warm before the workers start
+        seen, shared = set(), set()
+        for name in pending:
+            ancestors = self.ancestors(name)
+            shared |= seen & ancestors
+            seen |= ancestors
+        for name in shared:
+            self.get(name)
+
+        logger.info(f"Równoległe obliczanie {len(pending)} gałęzi ({workers} procesów)")
+        # spawn: forking a process that already runs pyarrow threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            results = pool.map(_compute_branch, [self] * len(pending), pending)
+            for name, (value, computed) in zip(pending, results):
+                self.computed.extend(computed)
+                # persisted branches stay on disk and are loaded lazily
+                if not self.nodes[name].persist:
+                    self._values[name] = value
+
+
+def _compute_branch(pipe, name):
+    value = pipe.get(name)
+    return (None if pipe.nodes[name].persist else value), pipe.computed
+
+
+# -------------------- stages --------------------
+
+def year_cube(normalized, stations, year):
+    """PM25Cube of one year's normalized wide frame."""
+    return PM25Cube.from_wide(normalized, year, stations)
+
+
+def pick(tables, name):
+    """Selects one table from the result of aggregate_cubes (or aggregate_all)."""
+    return tables[name]
+
+
+def clean_source(year, raw_dir, cache_dir=CACHE_DIR):
+    """
+    Loader, its parameters and the source file for one year: the
+    downloaded archive (raw_dir/archives/<year>.zip) when present,
+    raw<year>.csv otherwise.
+    """
+    archive = Path(raw_dir) / "archives" / f"{year}.zip"
+    if archive.exists():
+        return load_clean_archive, {
+            "year": year, "zip_path": str(archive),
+            "filename": archive_filename(year), "cache_dir": str(cache_dir),
+        }, archive
+
+    raw_path = Path(raw_dir) / f"raw{year}.csv"
+    return load_clean_year, {
+        "year": year, "raw_path": str(raw_path), "cache_dir": str(cache_dir),
+    }, raw_path
+
+
+def build_cleaning_pipeline(years, raw_dir, metadata_path, cache_dir=CACHE_DIR,
+                            min_coverage=None, recorder=None, station_policy="intersection",
+                            min_years=None):
+    """
+    Wires the cleaning stages into a Pipeline.
+
+    Per year: clean/<year> -> normalize/<year> -> cube/<year>, the dense
+    stations x hours PM25Cube; then 'aggregates' derives 'daily',
+    'monthly_PM25', 'df_ex2' and 'df_ex4' from the cubes, applying the
+    min_coverage rule of aggregate.tables_from_daily, and 'combined'
+    rebuilds the hourly long frame of all years (only when requested).
+    Both keep the stations chosen by station_policy and min_years (see
+    stations.align_stations).
+    'metadata' is the StationIndex built from metadata_path and
+    clean_source picks each year's input. The clean stage is not pickled,
+    since the raw_cache loaders keep their own Parquet cache. Each
+    cube/<year> node is a branch, so years are processed in parallel when the
+    pipeline runs with several workers.
+    """
+    pipe = Pipeline(Path(cache_dir) / "nodes", recorder=recorder)
+    pipe.add("metadata", load_station_index,
+             params={"path": str(metadata_path), "cache_dir": str(cache_dir)},
+             files=(metadata_path,), persist=False)
+
+    for year in years:
+        func, params, source = clean_source(year, raw_dir, cache_dir)
+        pipe.add(f"clean/{year}", func, params=params, files=(source,),
+                 persist=False)
+        pipe.add(f"normalize/{year}", normalize_station_codes,
+                 deps=(f"clean/{year}", "metadata"))
+        pipe.add(f"cube/{year}", year_cube,
+                 deps=(f"normalize/{year}", "metadata"), params={"year": year},
+                 branch=True)
+
+    cubes = [f"cube/{year}" for year in years]
+    alignment = {"station_policy": station_policy, "min_years": min_years}
+    pipe.add("combined", combine_cubes, deps=("metadata", *cubes), params=alignment)
+    pipe.add("aggregates", aggregate_cubes, deps=cubes,
+             params={"threshold": WHO_DAILY_LIMIT, "min_coverage": min_coverage, **alignment})
+    for name in ("daily", "monthly_PM25", "df_ex2", "df_ex4"):
+        pipe.add(name, pick, deps=("aggregates",), params={"name": name},
+                 persist=False)
+    return pipe
+
+
+def stream_cleaning(years, raw_dir, metadata_path, cache_dir=CACHE_DIR,
+                    chunk_hours=None, threshold=WHO_DAILY_LIMIT, min_coverage=None,
+                    recorder=None, station_policy="intersection", min_years=None):
+    """
+    Out-of-core alternative to build_cleaning_pipeline for many years.
+
+    Years are loaded and reduced to daily partial sums one at a time
+    (aggregate.stream_aggregate), so the hourly data of all years is never
+    held at once. Returns the same tables as the 'aggregates' node; there
+    is no 'combined' hourly frame in this mode. A StageRecorder records
+    the loading of each year and the whole streamed aggregation.
+    """
+    stations = load_station_index(metadata_path, cache_dir)
+
+    def load_year(year):
+        func, params, _ = clean_source(year, raw_dir, cache_dir)
+        if recorder is not None:
+            return recorder.call(f"clean/{year}", func, **params)
+        return func(**params)
+
+    run = functools.partial(stream_aggregate, years, load_year, stations,
+                            chunk_hours=chunk_hours, threshold=threshold,
+                            min_coverage=min_coverage, station_policy=station_policy,
+                            min_years=min_years)
+    return run() if recorder is None else recorder.call("stream_aggregate", run)
@@ -0,0 +1,136 @@
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_DIR = Path("data/processed")
+
+# bump when the stored columns, their types or the row order change
+TABLE_VERSION = 1
+
+# schema metadata key holding the description of a stored table
+METADATA_KEY = b"pm25.table"
+
+TABLES = {
+    "cleaned_and_combined": "Połączone i wyczyszczone dane godzinowe (wspólne stacje)",
+    "monthly_PM25": "Średnie miesięczne PM2.5 na stację",
+    "df_ex2": "Średnie miesięczne PM2.5 dla wybranych miast",
+    "df_ex4": "Liczba dni z przekroczeniem normy PM2.5 na stację i rok",
+}
+
+UNITS = {"PM2.5": "µg/m³"}
+
+# rows are stored in this order, so row groups have narrow year/city ranges
+SORT_KEYS = ("year", "city")
+
+ROW_GROUP_ROWS = 1 << 16
+
+
+def table_path(name, processed_dir=PROCESSED_DIR, suffix=".parquet"):
+    return Path(processed_dir) / f"{name}{suffix}"
+
+
+def _row_groups(df, keys, max_rows):
+    """
+    Boundaries of the row groups of a frame sorted by 'keys': runs of
+    equal keys are packed together up to max_rows, so a group starts at
+    a change of year or city whenever the file has more than one.
+    """
+    n = len(df)
+    if not keys or n <= max_rows:
+        return [0, n]
+    changed = np.zeros(n, dtype=bool)
+    for key in keys:
+        codes = pd.factorize(df[key], use_na_sentinel=False)[0]
+        changed[1:] |= codes[1:] != codes[:-1]
+    run_starts = np.append(np.flatnonzero(changed), n)
+
+    bounds = [0]
+    for start, end in zip(run_starts[:-1], run_starts[1:]):
+        if start > bounds[-1] and end - bounds[-1] > max_rows:
+            bounds.append(int(start))
+        # a run longer than a group is split evenly
+        while end - bounds[-1] > max_rows:
+            bounds.append(bounds[-1] + max_rows)
+    return bounds + [n]
+
+
+def write_table(df, name, processed_dir=PROCESSED_DIR, csv=False, row_group_rows=ROW_GROUP_ROWS,
+                compression="zstd"):
+    """
+    Stores a processed table as <name>.parquet: the frame's own types
+    (float32 readings, int16/int8 years and months, dictionary-encoded
+    stations and cities), zstd-compressed, rows sorted by year and city
+    and a JSON description of the table in the schema metadata. With
+    csv=True, <name>.csv is written as well, in the original row order.
+    """
+    processed_dir = Path(processed_dir)
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    path = table_path(name, processed_dir)
+
+    keys = [key for key in SORT_KEYS if key in df.columns]
+    stored = df.sort_values(keys, kind="stable") if keys else df
+    table = pa.Table.from_pandas(stored, preserve_index=False)
+    description = {
+        "table": name,
+        "version": TABLE_VERSION,
+        "description": TABLES.get(name, ""),
+        "sorted_by": keys,
+        "units": {column: unit for column, unit in UNITS.items() if column in df.columns},
+    }
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        METADATA_KEY: json.dumps(description, ensure_ascii=False).encode(),
+    })
+
+    tmp = path.with_suffix(".tmp")
+    with pq.ParquetWriter(tmp, table.schema, compression=compression) as writer:
+        bounds = _row_groups(stored, keys, row_group_rows)
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            writer.write_table(table.slice(start, end - start))
+    tmp.replace(path)
+    logger.info(f"Zapisano {path.name} ({len(df)} wierszy, {len(bounds) - 1} grup wierszy)")
+
+    if csv:
+        df.to_csv(table_path(name, processed_dir, ".csv"), index=False)
+        logger.info(f"Zapisano {name}.csv")
+    return path
+
+
+def table_metadata(name, processed_dir=PROCESSED_DIR):
+    """The description stored with a table (name, version, sort order, units)."""
+    metadata = pq.read_schema(table_path(name, processed_dir)).metadata or {}
+    return json.loads(metadata[METADATA_KEY]) if METADATA_KEY in metadata else {}
+
+
+def read_table(name, processed_dir=PROCESSED_DIR, columns=None, years=None, cities=None):
+    """
+    Loads a processed table, reading only 'columns' and only the row
+    groups that can hold the given 'years' and 'cities' (a value or a
+    list); rows outside them are dropped as well. Falls back to the CSV
+    export for directories written before the Parquet format.
+    """
+    filters = []
+    if years is not None:
+        filters.append(("year", "in", [int(y) for y in np.atleast_1d(years)]))
+    if cities is not None:
+        filters.append(("city", "in", [str(c) for c in np.atleast_1d(cities)]))
+
+    path = table_path(name, processed_dir)
+    if path.exists():
+        return pd.read_parquet(path, columns=columns, filters=filters or None)
+
+    csv_path = table_path(name, processed_dir, ".csv")
+    logger.warning(f"Brak {path.name}, wczytuję {csv_path.name}")
+    df = pd.read_csv(csv_path)
+    # older monthly_PM25.csv files carry the frame index as the first column
+    df = df.drop(columns=[c for c in df.columns if c.startswith("Unnamed: ")])
+    for column, _, values in filters:
+        df = df[df[column].isin(values)]
+    return df.reset_index(drop=True)[columns] if columns else df.reset_index(drop=True)
@@ -0,0 +1,242 @@
+import hashlib
+import itertools
+import logging
+import math
+import shutil
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from sources import HEADER_SCAN_ROWS, detect_header
+from timestamps import align_time_axis, parse_timestamps
+from utils import clean_gios_df, log_nan_percent, to_float32_columns
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path("data/cache")
+
+# bump when clean_gios_df, the xlsx streaming writer, timestamp parsing
+# or the stored schema changes
+CACHE_VERSION = "4"
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_prefix(year, dataset=None):
+    return f"clean{year}" if dataset is None else f"clean-{dataset}"
+
+
+def cache_path(year, checksum, cache_dir=CACHE_DIR, dataset=None):
+    """
+    Cache file for a year, keyed by the checksum of its source file.
+    'dataset' (e.g. '2018_PM10_1g') names sheets that share one source
+    archive.
+    """
+    key = hashlib.sha256(f"{CACHE_VERSION}:{checksum}".encode()).hexdigest()
+    return Path(cache_dir) / f"{_cache_prefix(year, dataset)}-{key[:16]}.parquet"
+
+
+def to_typed_wide(clean):
+    """
+    Converts the output of clean_gios_df to the cached schema:
+    float32 readings indexed by a datetime64 'Datetime' index. The time
+    column is parsed once, with the known GIOŚ layouts
+    (timestamps.parse_timestamps).
+    """
+    typed = to_float32_columns(clean)
+    typed["Datetime"] = parse_timestamps(typed["Datetime"])
+    typed = typed.set_index("Datetime")
+    typed.columns = typed.columns.astype(str)
+    typed.columns.name = None
+    return typed
+
+
+def store_clean_year(typed, year, checksum, cache_dir=CACHE_DIR):
+    """Writes a typed wide frame to the cache and drops stale entries."""
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_path(year, checksum, cache_dir)
+
+    for stale in cache_dir.glob(f"clean{year}-*.parquet"):
+        if stale != path:
+            stale.unlink()
+
+    typed.to_parquet(path)
+    logger.info(f"Zapisano cache dla {year}: {path}")
+    return path
+
+
+def _read_cached(path, year, columns=None):
+    """
+    Reads a cache file. The time index is checked against the year's hour
+    grid: gaps and repeated hours are logged, and a complete year gets
+    the exact hourly range instead of its stored timestamps.
+    """
+    typed = pd.read_parquet(path, columns=columns, memory_map=True)
+    typed.index = align_time_axis(typed.index, year)
+    return typed
+
+
+def _cell_to_float(value):
+    if value is None:
+        return math.nan
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).replace(",", "."))
+    except ValueError:
+        return math.nan
+
+
+def stream_xlsx_to_parquet(xlsx, year, path, chunk_rows=4096, header=None):
+    """
+    Converts a GIOŚ hourly sheet to the cached Parquet schema row by row.
+
+    The workbook is read in openpyxl read-only mode and values are turned
+    into float32 as rows arrive; every 'chunk_rows' rows are written out
+    as one Parquet row group, so the whole sheet is never held in memory
+    as Python objects. The header layout is detected from the top rows
+    unless 'header' gives it, as in clean_gios_df. Columns without a
+    station code are skipped; the share of missing values per column is
+    logged like clean_gios_df does (rows without a timestamp, which are
+    not stored, are not counted).
+    """
+    workbook = openpyxl.load_workbook(xlsx, read_only=True, data_only=True)
+    writer = None
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        head = list(itertools.islice(rows, HEADER_SCAN_ROWS))
+        code_row, first_data_row = header or detect_header([row[0] for row in head])
+        rows = itertools.chain(head[first_data_row:], rows)
+
+        codes = list(head[code_row][1:])
+        while codes and codes[-1] is None:
+            codes.pop()
+        keep = [i for i, code in enumerate(codes) if code is not None]
+        if len(keep) < len(codes):
+            logger.warning(f"{xlsx}: pominięto {len(codes) - len(keep)} kolumn bez kodu stacji")
+        stations = [str(codes[i]) for i in keep]
+
+        n_stations = len(stations)
+        schema = pa.Schema.from_pandas(
+            pd.DataFrame(
+                {station: pd.Series(dtype="float32") for station in stations},
+                index=pd.DatetimeIndex([], name="Datetime", dtype="datetime64[us]")
+            ),
+            preserve_index=True
+        )
+        writer = pq.ParquetWriter(path, schema)
+
+        values = np.empty((chunk_rows, n_stations), dtype="float32")
+        times = []
+        # missing timestamps, then missing values per station
+        missing = np.zeros(n_stations + 1, dtype=np.int64)
+        n_rows = 0
+
+        def flush():
+            nonlocal n_rows
+            index = parse_timestamps(pd.Series(times, dtype=object)).rename("Datetime")
+            chunk = pd.DataFrame(values[:len(times)], columns=stations, index=index)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=True))
+            missing[0] += index.isna().sum()
+            missing[1:] += np.isnan(values[:len(times)]).sum(axis=0)
+            n_rows += len(times)
+            times.clear()
+
+        for row in rows:
+            if row[0] is None:
+                continue
+            cells = row[1:len(codes) + 1]
+            parsed = [_cell_to_float(cells[i]) for i in keep if i < len(cells)]
+            values[len(times), :len(parsed)] = parsed
+            values[len(times), len(parsed):] = np.nan
+            times.append(row[0])
+            if len(times) == chunk_rows:
+                flush()
+        if times:
+            flush()
+        if n_rows:
+            log_nan_percent(pd.Series(missing / n_rows * 100, index=["Datetime", *stations]), year)
+    finally:
+        if writer is not None:
+            writer.close()
+        workbook.close()
+
+    return path
+
+
+def load_clean_archive(year, zip_path, filename, cache_dir=CACHE_DIR, columns=None,
+                       header=None):
+    """
+    Like load_clean_year, but builds the cache straight from the hourly
+    sheet 'filename' inside a downloaded GIOŚ ZIP, streaming it with
+    stream_xlsx_to_parquet instead of going through pd.read_excel and CSV.
+    Every sheet of the archive gets its own cache file.
+    """
+    checksum = file_checksum(zip_path)
+    dataset = Path(filename).stem
+    path = cache_path(year, checksum, cache_dir, dataset)
+
+    if not path.exists():
+        logger.info(f"Brak cache dla {dataset}, konwersja {filename} z {zip_path}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        xlsx_path = path.with_suffix(".xlsx")
+        # openpyxl seeks inside the workbook, which is very slow on a
+        # compressed ZIP member, so the sheet is unpacked to disk first
+        with zipfile.ZipFile(zip_path) as z, z.open(filename) as src, open(xlsx_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        try:
+            stream_xlsx_to_parquet(xlsx_path, year, tmp_path, header=header)
+        finally:
+            xlsx_path.unlink()
+        for stale in path.parent.glob(f"{_cache_prefix(year, dataset)}-*.parquet"):
+            stale.unlink()
+        tmp_path.replace(path)
+
+    typed = _read_cached(path, year, columns)
+    logger.info(f"Wczytano {dataset} z cache: {typed.shape[1]} stacji")
+    return typed.reset_index()
+
+
+def load_source(source, zip_path, cache_dir=CACHE_DIR, columns=None):
+    """load_clean_archive for a sources.Source entry."""
+    return load_clean_archive(source.year, zip_path, source.filename, cache_dir,
+                              columns=columns, header=source.header)
+
+
+def load_clean_year(year, raw_path, cache_dir=CACHE_DIR, columns=None):
+    """
+    Returns the cleaned wide frame for a year ('Datetime' column plus
+    float32 station columns).
+
+    The frame is read from the Parquet cache when one exists for the
+    current checksum of 'raw_path'; otherwise the raw CSV is parsed,
+    cleaned with clean_gios_df and cached. 'columns' limits the stations
+    read from the cache.
+    """
+    checksum = file_checksum(raw_path)
+    path = cache_path(year, checksum, cache_dir)
+
+    if not path.exists():
+        logger.info(f"Brak cache dla {year}, parsowanie {raw_path}")
+        # every raw cell is text; reading it as such avoids mixed-type inference
+        raw = pd.read_csv(raw_path, index_col=0, dtype=str)
+        raw.index = raw.index.astype(int)
+        store_clean_year(to_typed_wide(clean_gios_df(raw, year)), year, checksum, cache_dir)
+
+    typed = _read_cached(path, year, columns)
+    logger.info(f"Wczytano {year} z cache: {typed.shape[1]} stacji")
+    return typed.reset_index()
@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+import pandas as pd
+
+from timestamps import parse_timestamps
+
+GIOS_ARCHIVE_URL = "https://powietrze.gios.gov.pl/pjp/archives/downloadFile/"
+
+# one GIOŚ archive per year holds the sheets of every pollutant and period
+GIOS_ARCHIVE_IDS = {2015: "236", 2018: "603", 2021: "486", 2024: "582"}
+
+# label in the first column of the row holding station codes
+STATION_CODE_LABEL = "Kod stacji"
+
+# header rows are searched for within this many top rows of a sheet
+HEADER_SCAN_ROWS = 20
+
+
+def archive_filename(year, pollutant="PM25", period="1g"):
+    """Sheet name inside a GIOŚ archive, e.g. '2018_PM25_1g.xlsx'."""
+    return f"{year}_{pollutant}_{period}.xlsx"
+
+
+@dataclass(frozen=True)
+class Source:
+    """
+    One measurement sheet: year, the GIOŚ archive holding it, pollutant
+    and averaging period as used in GIOŚ file names ('PM25', 'PM10',
+    'NO2'; '1g' hourly, '24g' daily). 'header' is the (station code row,
+    first data row) layout; None detects it from the sheet.
+    """
+    year: int
+    archive_id: str
+    pollutant: str = "PM25"
+    period: str = "1g"
+    header: tuple | None = None
+
+    @property
+    def name(self):
+        return f"{self.year}_{self.pollutant}_{self.period}"
+
+    @property
+    def filename(self):
+        return archive_filename(self.year, self.pollutant, self.period)
+
+    @property
+    def url(self):
+        return f"{GIOS_ARCHIVE_URL}{self.archive_id}"
+
+
+def registry(years=None, pollutants=("PM25",), periods=("1g",), archive_ids=None):
+    """Sources for every combination of year, pollutant and period."""
+    archive_ids = GIOS_ARCHIVE_IDS if archive_ids is None else archive_ids
+    years = sorted(archive_ids) if years is None else years
+    return [
+        Source(year, archive_ids[year], pollutant, period)
+        for year in years
+        for pollutant in pollutants
+        for period in periods
+    ]
+
+
+def is_timestamp(value):
+    """True for a datetime cell or a text cell holding a timestamp in a GIOŚ layout."""
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return True
+    if not isinstance(value, str) or not value[:1].isdigit():
+        return False
+    return not parse_timestamps([value]).isna()[0]
+
+
+def detect_header(first_cells):
+    """
+    Finds the header layout from the first column of a GIOŚ sheet.
+
+    Returns (station code row, first data row): the row labelled
+    'Kod stacji' and the first row after it that starts with a
+    timestamp. The metadata rows in between (indicator, averaging time,
+    unit, ...) differ between years and are skipped.
+    """
+    code_row = None
+    for i, value in enumerate(first_cells):
+        if i >= HEADER_SCAN_ROWS:
+            break
+        if code_row is None:
+            if isinstance(value, str) and value.strip() == STATION_CODE_LABEL:
+                code_row = i
+        elif is_timestamp(value):
+            return code_row, i
+
+    if code_row is None:
+        raise ValueError(f"No '{STATION_CODE_LABEL}' row in the first {HEADER_SCAN_ROWS} rows")
+    raise ValueError(f"No data rows after the '{STATION_CODE_LABEL}' row")
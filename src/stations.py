@@ -0,0 +1,183 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+METADATA_PATH = Path("data/raw/Metadata.xlsx")
+CACHE_DIR = Path("data/cache")
+
+# bump when StationIndex or its construction from Metadata.xlsx changes
+INDEX_VERSION = "1"
+
+OLD_CODE_COLUMN = "Stary Kod stacji \n(o ile inny od aktualnego)"
+
+# Metadata.xlsx column -> StationIndex attribute
+METADATA_COLUMNS = {
+    "Miejscowość": "city",
+    "Województwo": "voivodeship",
+    "WGS84 φ N": "lat",
+    "WGS84 λ E": "lon",
+}
+
+
+@dataclass
+class StationIndex:
+    """
+    Station metadata prepared once for vectorized lookups.
+
+    'stations' is indexed by the current station code (unique) with the
+    columns city, voivodeship, lat and lon; 'old_to_new' maps every former
+    code to its current one. Lookups take any list-like of codes and
+    return aligned arrays.
+    """
+    stations: pd.DataFrame
+    old_to_new: pd.Series
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        codes = metadata["Kod stacji"].astype(str)
+        stations = pd.DataFrame(
+            {attr: metadata[col] if col in metadata else pd.NA
+             for col, attr in METADATA_COLUMNS.items()},
+            index=metadata.index
+        )
+        stations.index = pd.Index(codes, name="station")
+        stations = stations[~stations.index.duplicated()]
+
+        if OLD_CODE_COLUMN in metadata:
+            # one cell may list several former codes: "A, B"
+            old = (
+                metadata[OLD_CODE_COLUMN].astype("string").str.split(",")
+                .set_axis(codes).explode().str.strip().dropna()
+            )
+            old = old[old != ""]
+            old_to_new = pd.Series(old.index, index=pd.Index(old.to_numpy(), name="old_code"))
+            old_to_new = old_to_new[~old_to_new.index.duplicated()]
+        else:
+            old_to_new = pd.Series(dtype=str)
+
+        return cls(stations, old_to_new)
+
+    @property
+    def dictionary(self):
+        """Sorted current station codes, shared as categories by all years."""
+        return self.stations.index.sort_values()
+
+    def normalize(self, codes):
+        """Replaces former station codes with current ones."""
+        codes = pd.Index(codes).astype(str)
+        current = self.old_to_new.reindex(codes).to_numpy()
+        return pd.Index(codes.where(pd.isna(current), current))
+
+    def _lookup(self, attr, codes):
+        return self.stations[attr].reindex(pd.Index(codes).astype(str)).to_numpy()
+
+    def city(self, codes):
+        return self._lookup("city", codes)
+
+    def voivodeship(self, codes):
+        return self._lookup("voivodeship", codes)
+
+    def coordinates(self, codes):
+        return self.stations[["lat", "lon"]].reindex(pd.Index(codes).astype(str))
+
+
+def as_station_index(metadata):
+    """Accepts a StationIndex or a raw metadata DataFrame."""
+    if isinstance(metadata, StationIndex):
+        return metadata
+    return StationIndex.from_metadata(metadata)
+
+
+def load_station_index(path=METADATA_PATH, cache_dir=CACHE_DIR):
+    """
+    Builds the StationIndex from Metadata.xlsx, or loads it from a pickle
+    keyed by INDEX_VERSION and the checksum of the workbook, so the slow
+    read_excel runs only when the metadata (or the index) changes.
+    """
+    digest = hashlib.sha256(f"{INDEX_VERSION}:".encode() + Path(path).read_bytes()).hexdigest()
+    cache_path = Path(cache_dir) / f"stations-{digest[:16]}.pkl"
+
+    if cache_path.exists():
+        return pd.read_pickle(cache_path)
+
+    logger.info(f"Budowanie indeksu stacji z {path}")
+    index = StationIndex.from_metadata(pd.read_excel(path))
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    for stale in cache_path.parent.glob("stations-*.pkl"):
+        stale.unlink()
+    pd.to_pickle(index, cache_path)
+    return index
+
+
+# -------------------- multi-year station alignment --------------------
+
+STATION_POLICIES = ("intersection", "union", "min_years")
+
+
+@dataclass
+class StationAlignment:
+    """
+    Stations kept across years and the years each station has data in.
+
+    'presence' is a stations x years boolean frame over every station seen
+    in any year (first-seen order); 'stations' are the kept ones, in the
+    same order. Kept stations missing in a year have no readings (NaN)
+    there.
+    """
+    stations: pd.Index
+    presence: pd.DataFrame
+    policy: str
+
+    @property
+    def dropped(self):
+        """Years present of the stations left out, one row per station."""
+        return self.presence[~self.presence.index.isin(self.stations)]
+
+    def summary(self):
+        """Dropped stations with the years they have data in, e.g. 'S3 (2019)'."""
+        return ", ".join(
+            f"{station} ({', '.join(str(y) for y in years[years].index)})"
+            for station, years in self.dropped.iterrows()
+        )
+
+
+def align_stations(axes, policy="intersection", min_years=None):
+    """
+    Chooses the stations to keep from the stations with readings in every
+    year ({year: codes}, e.g. cube.stations_with_data): 'intersection'
+    keeps stations present in every year, 'union' every station,
+    'min_years' stations present in at least min_years years. Works on
+    the station codes only; callers leave out stations whose readings
+    are all missing in a year.
+    """
+    if policy not in STATION_POLICIES:
+        raise ValueError(f"Unknown station policy {policy!r}, expected one of {STATION_POLICIES}")
+    if policy == "min_years" and not min_years:
+        raise ValueError("policy 'min_years' needs min_years")
+
+    years = list(axes)
+    per_year = [pd.unique(pd.Index(codes).astype(str)) for codes in axes.values()]
+    codes, stations = pd.factorize(
+        np.concatenate(per_year) if per_year else np.array([], dtype=object)
+    )
+    presence = np.zeros((len(stations), len(years)), dtype=bool)
+    presence[codes, np.repeat(np.arange(len(years)), [len(p) for p in per_year])] = True
+
+    needed = {"intersection": len(years), "union": 1, "min_years": min_years}[policy]
+    n_years = presence.sum(axis=1)
+    alignment = StationAlignment(
+        pd.Index(stations[n_years >= needed]),
+        pd.DataFrame(presence, index=pd.Index(stations, name="station"), columns=years),
+        policy,
+    )
+    logger.info(f"Number of common stations for common years: {len(alignment.stations)} "
+                f"({policy}, z {len(stations)})")
+    if len(alignment.dropped):
+        logger.info(f"Pominięte stacje (lata z danymi): {alignment.summary()}")
+    return alignment
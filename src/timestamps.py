@@ -0,0 +1,170 @@
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HOUR = np.timedelta64(1, "h")
+
+# timestamp layouts of GIOŚ sheets, tried in this order: text exports
+# (whole seconds, or with the fractional drift of sheets saved by Excel),
+# and the day-first layouts of older files
+TIMESTAMP_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%d %H:%M",
+    "%d.%m.%Y %H:%M",
+    "%d/%m/%Y %H:%M",
+)
+
+
+def parse_timestamps(values, formats=TIMESTAMP_FORMATS):
+    """
+    Parses a time column (text, datetime objects or datetime64) into a
+    datetime64[us] DatetimeIndex, NaT where nothing matches.
+
+    Text is parsed with the explicit 'formats', each one only for the
+    values the previous ones did not match, so no format is inferred
+    row by row; formats matching more of a small sample of the column go
+    first. Datetime cells (openpyxl, read_excel) are converted as they
+    are.
+    """
+    values = pd.Series(values, copy=False).reset_index(drop=True)
+    if values.dtype.kind == "M":
+        return pd.DatetimeIndex(values.astype("datetime64[us]"))
+
+    parsed = np.full(len(values), np.datetime64("NaT", "us"))
+    if pd.api.types.infer_dtype(values, skipna=True) == "string":
+        text = values.notna().to_numpy()
+    else:
+        text = values.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    other = ~text & values.notna().to_numpy()
+    if other.any():
+        parsed[other] = pd.to_datetime(values[other], errors="coerce").to_numpy("datetime64[us]")
+
+    todo = text.copy()
+    for fmt in _by_sample_matches(values[text], formats):
+        if not todo.any():
+            break
+        out = pd.to_datetime(values[todo], format=fmt, errors="coerce").to_numpy("datetime64[us]")
+        parsed[todo] = out
+        todo[todo] = np.isnat(out)
+    return pd.DatetimeIndex(parsed)
+
+
+def _by_sample_matches(text, formats, size=16):
+    sample = text.iloc[np.linspace(0, len(text) - 1, min(size, len(text))).astype(int)]
+    matches = [pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum() for fmt in formats]
+    return [formats[i] for i in np.argsort(np.negative(matches), kind="stable")] if len(text) else []
+
+
+# -------------------- hour grid of a year --------------------
+
+def year_start(year):
+    return np.datetime64(f"{year}-01-01T00:00", "us")
+
+
+def days_in_year(year):
+    return int((np.datetime64(f"{year + 1}-01-01") - np.datetime64(f"{year}-01-01"))
+               / np.timedelta64(1, "D"))
+
+
+def regular_hours(year):
+    """End-of-hour timestamps of every hour of the year (01:00 .. 00:00 next year)."""
+    return pd.DatetimeIndex(year_start(year) + HOUR * np.arange(1, days_in_year(year) * 24 + 1))
+
+
+def hour_slots(times, year):
+    """
+    Hour slot of each timestamp on the year's grid, -1 outside of it.
+
+    GIOŚ timestamps mark the end of the averaging hour, so slot h is the
+    hour ending at <year>-01-01 00:00 + (h + 1) h. Timestamps are rounded
+    to the nearest hour first: sheets exported from Excel drift by up to
+    a minute over a year.
+    """
+    times = parse_timestamps(times).to_numpy()
+    n_hours = days_in_year(year) * 24
+    slots = np.full(len(times), -1, dtype=np.int64)
+    known = ~np.isnat(times)
+    offset = (times[known] - year_start(year)) / HOUR
+    slot = np.rint(offset).astype(np.int64) - 1
+    slots[known] = np.where((slot >= 0) & (slot < n_hours), slot, -1)
+    return slots
+
+
+@dataclass
+class TimeAxisCheck:
+    """
+    How a year's time column fits the hour grid: unparsed timestamps,
+    rows outside the year, hours given more than once, hours missing,
+    rows earlier than the row before them and the largest distance of a
+    timestamp from its full hour.
+    """
+    year: int
+    rows: int
+    unparsed: int
+    off_grid: int
+    duplicates: int
+    gaps: int
+    out_of_order: int
+    max_drift: pd.Timedelta
+
+    @property
+    def complete(self):
+        """Exactly one row per hour of the year, in order."""
+        return self.rows == days_in_year(self.year) * 24 and not (
+            self.unparsed or self.off_grid or self.duplicates or self.gaps or self.out_of_order
+        )
+
+    def problems(self):
+        return ", ".join(
+            f"{name}: {count}"
+            for name, count in [("nieczytelne", self.unparsed), ("poza rokiem", self.off_grid),
+                                ("powtórzone godziny", self.duplicates),
+                                ("brakujące godziny", self.gaps),
+                                ("poza kolejnością", self.out_of_order)]
+            if count
+        )
+
+
+def check_hourly(times, year):
+    """Validates a parsed time column against the year's hour grid."""
+    times = parse_timestamps(times)
+    slots = hour_slots(times, year)
+    on_grid = slots[slots >= 0]
+    counts = np.bincount(on_grid, minlength=days_in_year(year) * 24)
+
+    known = times[~times.isna()]
+    drift = abs(known - known.round("h")).max() if len(known) else pd.Timedelta(0)
+    return TimeAxisCheck(
+        year=year,
+        rows=len(times),
+        unparsed=int(times.isna().sum()),
+        off_grid=int((~times.isna() & (slots < 0)).sum()),
+        duplicates=int((counts > 1).sum()),
+        gaps=int((counts == 0).sum()),
+        out_of_order=int((np.diff(on_grid) < 0).sum()),
+        max_drift=drift,
+    )
+
+
+def align_time_axis(times, year):
+    """
+    The year's time column checked against its hour grid: a complete
+    column is replaced by the synthesized regular_hours (dropping the
+    Excel drift), anything else is returned as parsed, with its gaps and
+    duplicates logged.
+    """
+    times = parse_timestamps(times)
+    check = check_hourly(times, year)
+    if check.complete:
+        if check.max_drift > pd.Timedelta(0):
+            logger.info(f"{year}: znaczniki czasu przesunięte do {check.max_drift}, "
+                        f"zastąpione regularną siatką godzinową")
+        return regular_hours(year).rename(times.name)
+    if check.rows:
+        logger.warning(f"{year}: niepełna oś czasu ({check.rows} wierszy) – {check.problems()}")
+    return times
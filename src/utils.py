@@ -1,9 +1,11 @@
 import logging
-import requests
-import zipfile
-import io
+from pathlib import Path
+import numpy as np
 import pandas as pd
 
+from sources import detect_header
+from stations import as_station_index
+
 
 logging.basicConfig(
     level=logging.INFO,
@@ -11,177 +13,196 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def download_gios_archive(year, gios_archive_url, gios_id, filename):
-    # Pobranie archiwum ZIP do pamięci
-    url = f"{gios_archive_url}{gios_id}"
-    logger.info(f"Pobieranie danych GIOŚ dla roku {year}")
-
-    response = requests.get(url)
-    response.raise_for_status()
-    
-    with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-        if not filename:
-            logger.error(f"Plik {filename} nie znaleziony w archiwum {year}")
-            return None
-        else:
-            with z.open(filename) as f:
-                try:
-                    df = pd.read_excel(f, header=None)
-                except Exception as e:
-                    logger.error(f"Błąd przy wczytywaniu danych {year}: {e}")
-                    return None
-
-    logger.info(f"Dane dla {year} wczytane poprawnie")
-    return df
-
-
-def clean_gios_df(df, year):
+def clean_gios_df(df, year, header=None):
     """
     Prepares raw GIOŚ measurement data by:
-    - removing metadata rows,
-    - using the first data row as column names,
-    - removing that header row from the data,
+    - finding the station code row and the first data row (detect_header),
+      unless 'header' gives them as (code row, first data row),
+    - using the station codes as column names,
+    - dropping the metadata rows above the data,
     - standardizing the timestamp column name to 'Datetime'.
     """
-    if year > 2015:
-        df = df.drop(index=[0, 2, 3, 4, 5])
-    else:
-        df = df.drop(index=[1, 2])
+    code_row, first_data_row = header or detect_header(df.iloc[:, 0])
 
-    header = df.iloc[0]
-    df = df.iloc[1:]
-    df.columns = header
-    df.columns.values[0] = "Datetime"
+    codes = df.iloc[code_row]
+    df = df.iloc[first_data_row:]
+    df.columns = ["Datetime", *codes.iloc[1:]]
 
     df = df.reset_index(drop=True)
 
-    # ---- NaN percentage logging ----
-    nan_percent = df.isna().mean() * 100
+    log_nan_percent(df.isna().mean() * 100, year)
+    return df
+
 
+def log_nan_percent(nan_percent, year):
+    """Logs the share of missing values [%] of every column of a year."""
     logging.info(f"NaN percentage per column for year {year}:")
     for col, pct in nan_percent.items():
         logging.info(f"  {col}: {pct:.2f}%")
 
-    return df
 
 
 
+# a decimal number once a decimal comma has been replaced by a dot
+NUMBER_PATTERN = r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$"
 
-def normalize_station_codes(df, metadata):
-    """Normalize station names to keep them consistent and up to date."""
-    mapping = {}
 
-    for _, row in metadata.iterrows():
-        old_code = row["Stary Kod stacji \n(o ile inny od aktualnego)"]
-        new_code = row["Kod stacji"]
+def parse_decimal_comma(values):
+    """
+    Parses a 1-D array of text (or mixed) values to float32 in one
+    vectorized pass. Both decimal commas and dots are accepted;
+    anything that is not a number becomes NaN.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    text = pa.array(pd.Series(values, dtype=object).astype(str), type=pa.string())
+    text = pc.utf8_trim_whitespace(pc.replace_substring(text, ",", "."))
+    numbers = pc.if_else(
+        pc.match_substring_regex(text, NUMBER_PATTERN), text, pa.scalar(None, pa.string())
+    )
+    return pc.cast(numbers, pa.float32()).to_numpy(zero_copy_only=False)
 
-        if pd.notna(old_code):
-            mapping[old_code] = new_code
 
-    return df.rename(columns=mapping)
+def to_float32_columns(df, skip=("Datetime",)):
+    """
+    Converts measurement columns of a wide GIOŚ frame to float32.
+    Text columns may use decimal commas; unparseable values become NaN.
+    All text columns are parsed together in a single call; numeric
+    columns are only cast. Columns listed in 'skip' are left untouched.
+    """
+    text_cols = [
+        col for col in df.columns
+        if col not in skip and not pd.api.types.is_numeric_dtype(df[col])
+    ]
+    parsed = {}
+    if text_cols:
+        flat = parse_decimal_comma(df[text_cols].to_numpy(dtype=object).ravel(order="F"))
+        for i, col in enumerate(text_cols):
+            parsed[col] = flat[i * len(df):(i + 1) * len(df)]
+
+    out = {}
+    for col in df.columns:
+        if col in skip:
+            out[col] = df[col]
+        elif col in parsed:
+            out[col] = parsed[col]
+        else:
+            out[col] = df[col].astype("float32")
+
+    return pd.DataFrame(out, index=df.index)
 
 
-def to_long(df):
+def normalize_station_codes(df, metadata):
+    """
+    Normalize station names to keep them consistent and up to date.
+    'metadata' is a StationIndex or the raw Metadata.xlsx frame.
+    """
+    stations = as_station_index(metadata)
+    out = df.copy(deep=False)
+    out.columns = stations.normalize(out.columns)
+    return out
+
+
+def station_dictionary(metadata):
+    """
+    Shared, sorted category list of current station codes from
+    Metadata.xlsx, so every year's long frame encodes stations the same way.
+    """
+    return as_station_index(metadata).dictionary
+
+
+def to_long(df, stations=None):
     """
     Converts wide GIOŚ PM2.5 data to long format and
     ensures PM2.5 values are numeric.
+
+    Values are converted to float32 while still wide (only text columns
+    go through the decimal-comma parse), then reshaped with NumPy: each
+    station's column becomes one contiguous block, in the same order
+    pd.melt would produce. 'station' is categorical; pass the shared
+    'stations' dictionary (see station_dictionary) to use its codes,
+    codes missing from it are appended.
     """
-    long_df = pd.melt(
-        df,
-        id_vars=["Datetime"],
-        var_name="station",
-        value_name="PM2.5"
-    )
+    wide = to_float32_columns(df.drop(columns="Datetime"), skip=())
+    n_times, n_stations = wide.shape
 
-    # replace commas with dots and coerce to numeric
-    long_df["PM2.5"] = (
-        long_df["PM2.5"]
-        .astype(str)
-        .str.replace(",", ".", regex=False)
+    columns = wide.columns.astype(str)
+    categories = columns.unique() if stations is None else stations.append(
+        columns.difference(stations, sort=False)
     )
-    long_df["PM2.5"] = pd.to_numeric(long_df["PM2.5"], errors="coerce")
+    station_codes = np.repeat(categories.get_indexer(columns), n_times)
+
+    long_df = pd.DataFrame({
+        "Datetime": np.tile(df["Datetime"].to_numpy(), n_stations),
+        "station": pd.Categorical.from_codes(station_codes, categories=categories),
+        "PM2.5": wide.to_numpy(dtype="float32").ravel(order="F"),
+    })
 
     return long_df
 
 
 
 def add_city(df, metadata):
-    station_city = dict(
-        zip(metadata["Kod stacji"], metadata["Miejscowość"])
-    )
-    df["city"] = df["station"].map(station_city)
+    """
+    Maps stations to cities. 'metadata' is a StationIndex or the raw
+    Metadata.xlsx frame.
+    """
+    stations = as_station_index(metadata)
+    if isinstance(df["station"].dtype, pd.CategoricalDtype):
+        # look each station category up once and reuse the integer codes
+        station = df["station"].cat
+        per_station = stations.city(station.categories)
+        cities = pd.Index(sorted(pd.unique(stations.stations["city"].dropna())))
+        city_codes = cities.get_indexer(per_station)
+        codes = np.where(station.codes >= 0, city_codes[station.codes], -1)
+        df["city"] = pd.Categorical.from_codes(codes, categories=cities)
+    else:
+        df["city"] = stations.city(df["station"])
     return df
 
 
-import pandas as pd
-import plotly.graph_objects as go
+def unify_categories(frames, column):
+    """Gives a categorical column the same categories in every frame, so concat keeps it categorical."""
+    if not all(isinstance(df[column].dtype, pd.CategoricalDtype) for df in frames):
+        return frames
+    categories = pd.Index(pd.unique(np.concatenate(
+        [df[column].cat.categories.to_numpy(dtype=object) for df in frames]
+    )))
+    dtype = pd.CategoricalDtype(categories)
+    return [df.assign(**{column: df[column].astype(dtype)}) for df in frames]
 
-def plot_exceeded_days_top_bottom(
-    df_ex4,
-    year=2024,
-    top_n=3,
-):
-    """
-    Creates a grouped bar plot for stations with the highest and lowest
-    number of exceeded PM2.5 days in a given year.
 
-    Parameters:
-    - df_ex4 (pd.DataFrame): DataFrame with columns ['year', 'station', 'exceeded']
-    - year (int): Reference year for selecting top/bottom stations
-    - top_n (int): Number of top and bottom stations to include
+def assign_measurement_day(df, datetime_col="Datetime"):
     """
-    df_year = df_ex4[df_ex4["year"] == year]
-
-    top = df_year.nlargest(top_n, "exceeded")
-    bottom = df_year.nsmallest(top_n, "exceeded")
-    stations = pd.concat([top, bottom])["station"].unique()
+    Assigns each hourly measurement to its measurement day and month.
 
-    plot_df = df_ex4[df_ex4["station"].isin(stations)].copy()
+    GIOŚ timestamps mark the end of the averaging hour, so a reading
+    stamped at 00:xx belongs to the previous day. Shifting every
+    timestamp back by one hour and truncating to midnight gives the same
+    result as checking the hour row by row, but runs vectorized.
+    'month' is taken from the shifted day directly, without re-parsing.
+    """
+    day = (df[datetime_col] - pd.Timedelta(hours=1)).dt.normalize()
+    df["date"] = day
+    df["month"] = day.dt.month.astype("int8")
+    return df
 
-    station_groups = plot_df["station"].unique()
 
-    colors = [
-        "#7FB3D5",
-        "#1F618D",
-        "#F4D03F",
-        "#C0392B",
-        "#008080",
-        "#40B0A6"
-    ]
-
-    bars = []
-    for i, station in enumerate(station_groups):
-        df_station = plot_df[plot_df["station"] == station]
-        bar = go.Bar(
-            x=df_station["year"],
-            y=df_station["exceeded"],
-            name=station,
-            marker=dict(color=colors[i % len(colors)])
-        )
-        bars.append(bar)
-
-    fig = go.Figure(data=bars)
-    fig.update_layout(
-        height=800,
-        font=dict(
-            family="Liberation Serif",
-            size=20,
-            color="#2C3E50"
-        ),
-        barmode="group",
-        title=dict(
-            text="Dni z przekroczeniem normy (WHO)",
-            x=0.5,
-            xanchor="center",
-            font=dict(
-                family="Liberation Serif",
-                size=35,
-                color="#2C3E50"
-            )
-        ),
-        xaxis_title="Rok",
-        yaxis_title="Liczba przekroczonych dni",
-    )
+def memory_report(df):
+    """Dtype and deep memory usage [MiB] per column, with a total row."""
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "MiB": df.memory_usage(deep=True, index=False) / 2**20,
+    })
+    report.loc["total"] = ["", report["MiB"].sum()]
+    return report
 
-    return fig
 
+def __getattr__(name):
+    # the plotting function moved to visualizations; importing it from
+    # here (as the notebook does) loads the plotting modules on first use
+    if name == "plot_exceeded_days_top_bottom":
+        from visualizations import plot_exceeded_days_top_bottom
+        return plot_exceeded_days_top_bottom
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
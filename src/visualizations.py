@@ -1,9 +1,21 @@
 from __future__ import annotations
 import math
-from typing import Sequence, Optional, Tuple
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Sequence, Optional, Tuple
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+from means import HeatmapCube
+
+# matplotlib, seaborn and plotly are imported inside the plotting
+# functions: they take most of the import time and the data-processing
+# modules do not need them
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
 
 
 # Wykres do zad. 2:
@@ -14,6 +26,7 @@ def plot_city_trends(
     years: Sequence[int] = (2015, 2024),
     figsize: Tuple[float, float] = (10, 6),
 ) -> plt.Figure:
+    import matplotlib.pyplot as plt
 
     fig, ax = plt.subplots(figsize=figsize)
 
@@ -41,7 +54,7 @@ def plot_city_trends(
 
 # Heatmapa do zad 3:
 def plot_city_heatmaps(
-    df_ex3: pd.DataFrame,
+    df_ex3: pd.DataFrame | HeatmapCube,
     cities: Sequence[str],
     years: Sequence[int] = (2015, 2018, 2021, 2024),
     ncols: int = 4,
@@ -49,11 +62,23 @@ def plot_city_heatmaps(
     annot: bool = False,
     fmt: str = ".1f",
 ) -> plt.Figure:
+    cube = _as_heatmap_cube(df_ex3, cities, years)
+    return _heatmap_grid(cube.cities, cube.years, cube.values, ncols, figsize_per_panel,
+                         annot, fmt)
 
-    sns.set_theme(style="white")
 
-    # filtrujemy tylko wybrane miasta
-    df_plot = df_ex3[df_ex3["city"].isin(cities)].copy()
+def _as_heatmap_cube(df_ex3, cities=None, years=None):
+    # wszystkie miasta naraz do tablicy miasto x rok x miesiąc
+    if not isinstance(df_ex3, HeatmapCube):
+        return HeatmapCube.from_df(df_ex3, cities=cities, years=years)
+    return df_ex3 if cities is None else df_ex3.select(cities)
+
+
+def _heatmap_grid(cities, years, values, ncols, figsize_per_panel, annot=False, fmt=".1f"):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme(style="white")
 
     n_panels = len(cities)
     nrows = math.ceil(n_panels / ncols)
@@ -69,57 +94,119 @@ def plot_city_heatmaps(
         constrained_layout=True
     )
 
-    axes = axes.flatten()
+    axes = np.atleast_1d(axes).flatten()
 
-    for ax, city in zip(axes, cities):
+    for ax, city, panel in zip(axes, cities, values):
+        _draw_heatmap_panel(fig, ax, city, years, panel, annot, fmt)
 
-        data = df_plot[df_plot["city"] == city]
+    # wyłącz puste panele
+    for ax in axes[len(cities):]:
+        ax.axis("off")
 
-        heatmap_data = (
-            data.pivot(index="year", columns="month", values="PM2.5")
-            .reindex(index=years)
-            .reindex(columns=range(1, 13))
-            .astype(float)
-        )
+    return fig
 
-        # Dla każdego miasta robię własną skale
-        vals = heatmap_data.stack().dropna()
-        vmin = float(vals.min())
-        vmax = float(vals.max())
-
-        hm = sns.heatmap(
-            heatmap_data,
-            ax=ax,
-            cmap="coolwarm",
-            vmin=vmin,
-            vmax=vmax,
-            annot=annot,
-            fmt=fmt,
-            cbar=True,
-            cbar_kws={"shrink": 0.75}
-        )
 
-        cbar = hm.collections[0].colorbar
+def _draw_heatmap_panel(fig, ax, city, years, panel, annot=False, fmt=".1f"):
+    # pcolormesh zamiast sns.heatmap: seaborn dopasowuje etykiety osi
+    # renderując tekst, co przy wielu panelach kosztuje ~1 s na panel;
+    # wygląd (bez ramek, pasek kolorów bez obwódki) jak w sns.heatmap
+    vals = panel[~np.isnan(panel)]
+
+    # Dla każdego miasta robię własną skale
+    vmin = float(vals.min()) if vals.size else None
+    vmax = float(vals.max()) if vals.size else None
+
+    mesh = ax.pcolormesh(np.ma.masked_invalid(panel), cmap="coolwarm", vmin=vmin, vmax=vmax)
+    ax.invert_yaxis()
 
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    cbar = fig.colorbar(mesh, ax=ax, shrink=0.75)
+    cbar.outline.set_linewidth(0)
+    if vals.size:
         cbar.set_ticks([vmin, vmax])
         cbar.set_ticklabels(
             [f"{vmin:.1f}", f"{vmax:.1f}"]
         )
-        cbar.ax.tick_params(labelsize=7)
-        cbar.ax.yaxis.set_ticks_position("both")
+    cbar.ax.tick_params(labelsize=7)
+    cbar.ax.yaxis.set_ticks_position("both")
 
-        ax.set_title(city, fontsize=9)
-        ax.set_xlabel("")
-        ax.set_ylabel("")
-        ax.set_xticks(range(1, 13))
-        ax.set_xticklabels(range(1, 13), fontsize=7, rotation=0)
-        ax.set_yticklabels(ax.get_yticklabels(), fontsize=7, rotation=0)
+    if annot:
+        for (i, m), value in np.ndenumerate(panel):
+            if not np.isnan(value):
+                ax.text(m + 0.5, i + 0.5, format(value, fmt), ha="center", va="center",
+                        fontsize=6)
 
-    # wyłącz puste panele
-    for ax in axes[len(cities):]:
-        ax.axis("off")
+    ax.set_title(city, fontsize=9)
+    ax.set_xticks(np.arange(12) + 0.5)
+    ax.set_xticklabels(range(1, 13), fontsize=7, rotation=0)
+    ax.set_yticks(np.arange(len(years)) + 0.5)
+    ax.set_yticklabels(years, fontsize=7, rotation=0)
+    ax.tick_params(length=0)
 
-    return fig
+
+def _render_heatmap_page(path, cities, years, values, ncols, figsize_per_panel, dpi):
+    import matplotlib.pyplot as plt
+
+    fig = _heatmap_grid(cities, years, values, ncols, figsize_per_panel)
+    fig.savefig(path, dpi=dpi)
+    plt.close(fig)
+    return path
+
+
+def _render_heatmap_page_worker(task):
+    # procesy robocze rysują bez okienek
+    import matplotlib
+    matplotlib.use("Agg")
+    return _render_heatmap_page(*task)
+
+
+def render_heatmaps(
+    df_ex3: pd.DataFrame | HeatmapCube,
+    out_dir: str | Path,
+    cities: Optional[Sequence[str]] = None,
+    years: Optional[Sequence[int]] = None,
+    per_page: int = 1,
+    ncols: int = 4,
+    figsize_per_panel: Tuple[float, float] = (2.6, 2.0),
+    file_format: str = "png",
+    dpi: int = 100,
+    workers: Optional[int] = None,
+) -> list[Path]:
+    """
+    Zapisuje heatmapy wielu miast do plików: jeden plik na miasto
+    (per_page=1, heatmap_<miasto>.png) albo strony po per_page paneli
+    (heatmaps_001.png, ...). Dane są raz przekształcane do HeatmapCube,
+    a strony rysowane równolegle w 'workers' procesach (domyślnie liczba
+    CPU). Zwraca ścieżki zapisanych plików.
+    """
+    cube = _as_heatmap_cube(df_ex3, cities, years)
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    tasks = []
+    for page, start in enumerate(range(0, len(cube.cities), per_page), start=1):
+        page_cities = cube.cities[start:start + per_page]
+        if per_page == 1:
+            name = "heatmap_" + re.sub(r"[^\w-]+", "_", page_cities[0])
+        else:
+            name = f"heatmaps_{page:03d}"
+        tasks.append((
+            out_dir / f"{name}.{file_format}", page_cities, cube.years,
+            cube.values[start:start + per_page], min(ncols, len(page_cities)),
+            figsize_per_panel, dpi,
+        ))
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [_render_heatmap_page(*task) for task in tasks]
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        chunksize = max(1, len(tasks) // (4 * workers))
+        return list(pool.map(_render_heatmap_page_worker, tasks, chunksize=chunksize))
 
 #Wizualizacja do zadania 7
 def plot_voivodeship_stats(stats_df: pd.DataFrame) -> plt.Figure:
@@ -127,6 +214,9 @@ def plot_voivodeship_stats(stats_df: pd.DataFrame) -> plt.Figure:
     Rysuje wykres słupkowy średniej liczby dni z przekroczeniem normy PM2.5
     dla województw z podziałem na lata.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     fig, ax = plt.subplots(figsize=(14, 7))
 
     sns.barplot(
@@ -146,4 +236,90 @@ def plot_voivodeship_stats(stats_df: pd.DataFrame) -> plt.Figure:
     plt.xticks(rotation=45, ha='right')
     plt.tight_layout()
 
-    return fig
\ No newline at end of file
+    return fig
+
+# Wykres przekroczeń (plotly)
+def plot_exceeded_days_top_bottom(
+    df_ex4,
+    year=2024,
+    top_n=3,
+    threshold=None,
+):
+    """
+    Creates a grouped bar plot for stations with the highest and lowest
+    number of exceeded PM2.5 days in a given year.
+
+    Parameters:
+    - df_ex4 (pd.DataFrame): DataFrame with columns ['year', 'station', 'exceeded'],
+      or an exceedance.ExceedanceIndex to count days for 'threshold'
+    - year (int): Reference year for selecting top/bottom stations
+    - top_n (int): Number of top and bottom stations to include
+    - threshold (float): Daily limit [µg/m³]; needs an ExceedanceIndex,
+      None keeps the WHO limit
+    """
+    import plotly.graph_objects as go
+
+    if hasattr(df_ex4, "exceedance_counts"):
+        df_ex4 = (df_ex4.exceedance_counts() if threshold is None
+                  else df_ex4.exceedance_counts(threshold))
+    elif threshold is not None:
+        raise ValueError("threshold requires an ExceedanceIndex, not a precomputed df_ex4")
+
+    title = ("Dni z przekroczeniem normy (WHO)" if threshold is None
+             else f"Dni ze średnią dobową PM2.5 > {threshold} µg/m³")
+
+    df_year = df_ex4[df_ex4["year"] == year]
+
+    top = df_year.nlargest(top_n, "exceeded")
+    bottom = df_year.nsmallest(top_n, "exceeded")
+    stations = pd.concat([top, bottom])["station"].unique()
+
+    plot_df = df_ex4[df_ex4["station"].isin(stations)].copy()
+
+    station_groups = plot_df["station"].unique()
+
+    colors = [
+        "#7FB3D5",
+        "#1F618D",
+        "#F4D03F",
+        "#C0392B",
+        "#008080",
+        "#40B0A6"
+    ]
+
+    bars = []
+    for i, station in enumerate(station_groups):
+        df_station = plot_df[plot_df["station"] == station]
+        bar = go.Bar(
+            x=df_station["year"],
+            y=df_station["exceeded"],
+            name=station,
+            marker=dict(color=colors[i % len(colors)])
+        )
+        bars.append(bar)
+
+    fig = go.Figure(data=bars)
+    fig.update_layout(
+        height=800,
+        font=dict(
+            family="Liberation Serif",
+            size=20,
+            color="#2C3E50"
+        ),
+        barmode="group",
+        title=dict(
+            text=title,
+            x=0.5,
+            xanchor="center",
+            font=dict(
+                family="Liberation Serif",
+                size=35,
+                color="#2C3E50"
+            )
+        ),
+        xaxis_title="Rok",
+        yaxis_title="Liczba przekroczonych dni",
+    )
+
+    return fig
+
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stations import align_stations
+from utils import (
+    add_city,
+    assign_measurement_day,
+    normalize_station_codes,
+    to_long,
+    unify_categories
+)
+
+
+@pytest.fixture
+def wide_year():
+    """Builds a wide hourly frame of one year: gamma noise with ~10% gaps."""
+    def build(year, stations, seed):
+        rng = np.random.default_rng(seed)
+        times = pd.date_range(f"{year}-01-01 01:00", f"{year + 1}-01-01 00:00", freq="h")
+        values = rng.gamma(2.0, 10.0, (len(times), len(stations))).astype("float32")
+        values[rng.random(values.shape) < 0.1] = np.nan
+        return pd.DataFrame({"Datetime": times, **dict(zip(stations, values.T))})
+
+    return build
+
+
+def city_year_long(wide, stations, year):
+    """Long frame of one year with cities, built row by row with to_long."""
+    long = add_city(to_long(normalize_station_codes(wide, stations), stations.dictionary),
+                    stations)
+    long["year"] = np.full(len(long), year, dtype="int16")
+    return long
+
+
+def combine_years(frames, station_policy="intersection", min_years=None):
+    """
+    Reference for cube.combine_cubes on long frames: keeps the stations
+    chosen by align_stations, concatenates the years and assigns
+    measurement days.
+    """
+    axes = {df["year"].iloc[0]: pd.Index(df.loc[df["PM2.5"].notna(), "station"].unique())
+            for df in frames}
+    kept = align_stations(axes, station_policy, min_years).stations
+
+    for column in ("station", "city"):
+        frames = unify_categories(frames, column)
+    frames = [df[df["station"].isin(kept)] for df in frames]
+
+    combined = pd.concat(frames, ignore_index=True)
+    combined = combined.dropna(subset=["Datetime", "PM2.5"])
+    combined = assign_measurement_day(combined)
+    return combined.drop(columns=["Datetime"])
+
+
+@pytest.fixture
+def long_combined():
+    """Combines {year: wide frame} through long frames, the way the pipeline did before the cubes."""
+    def build(wide, stations, station_policy="intersection", min_years=None):
+        frames = [city_year_long(df, stations, year) for year, df in wide.items()]
+        return combine_years(frames, station_policy, min_years)
+
+    return build
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregate import (
+    aggregate_all,
+    cube_tables,
+    read_daily_cube,
+    stream_aggregate,
+    write_daily_cube
+)
+from stations import StationIndex
+
+
+def hourly_frame():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2018-01-01", "2018-03-31", freq="D").repeat(24)
+    frames = []
+    for station, city in [("S1", "Warszawa"), ("S2", "Katowice"), ("S3", "Kraków")]:
+        frames.append(pd.DataFrame({
+            "year": np.int16(2018),
+            "station": station,
+            "city": city,
+            "date": dates,
+            "month": dates.month.astype("int8"),
+            "PM2.5": rng.gamma(2.0, 10.0, len(dates)).astype("float32"),
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    df.loc[::7, "PM2.5"] = np.nan
+    for column in ("station", "city"):
+        df[column] = df[column].astype("category")
+    return df
+
+
+def test_exceedance_counts_days_above_threshold():
+    combined = pd.DataFrame({
+        "year": 2018,
+        "station": "S1",
+        "city": "X",
+        "date": pd.to_datetime(["2018-01-01", "2018-01-01", "2018-01-02"]),
+        "PM2.5": [10.0, 30.0, 12.0],
+    })
+
+    assert aggregate_all(combined, threshold=15)["df_ex4"]["exceeded"].iloc[0] == 1
+    assert aggregate_all(combined, threshold=10)["df_ex4"]["exceeded"].iloc[0] == 2
+
+
+def test_aggregate_all_matches_groupby():
+    combined = hourly_frame()
+    tables = aggregate_all(combined, threshold=25)
+
+    monthly = combined.groupby(
+        ["year", "month", "station", "city"], as_index=False, observed=True
+    )[["PM2.5"]].mean()
+    pd.testing.assert_frame_equal(
+        tables["monthly_PM25"][["year", "month", "station", "PM2.5"]].astype({"station": str}),
+        monthly[["year", "month", "station", "PM2.5"]].astype({"station": str}),
+        check_dtype=False, rtol=1e-5,
+    )
+
+    daily = combined.groupby(["station", "date"], observed=True)["PM2.5"].mean()
+    exceeded = (daily > 25).groupby(level="station", observed=True).sum()
+    assert tables["df_ex4"]["exceeded"].tolist() == exceeded.tolist()
+
+    assert set(tables["df_ex2"]["city"]) == {"Warszawa", "Katowice"}
+    assert tables["daily"]["n_hours"].sum() == combined["PM2.5"].notna().sum()
+
+
+def test_stream_aggregate_matches_in_memory_path(wide_year, long_combined):
+    stations = StationIndex.from_metadata(pd.DataFrame({
+        "Kod stacji": ["S1", "S2", "S3"],
+        "Miejscowość": ["Warszawa", "Katowice", "Kraków"],
+    }))
+    wide = {2018: wide_year(2018, ["S1", "S2"], 1), 2019: wide_year(2019, ["S2", "S3", "S1"], 2)}
+
+    expected = aggregate_all(long_combined(wide, stations))
+    streamed = stream_aggregate(wide, wide.get, stations, chunk_hours=500)
+
+    for name in ("monthly_PM25", "df_ex4"):
+        pd.testing.assert_frame_equal(streamed[name], expected[name], rtol=1e-6)
+    assert set(streamed["daily"]["station"]) == {"S1", "S2"}
+
+
+def test_stream_aggregate_ignores_stations_without_readings(wide_year):
+    stations = StationIndex.from_metadata(pd.DataFrame({
+        "Kod stacji": ["S1", "S2"], "Miejscowość": ["Warszawa", "Katowice"],
+    }))
+    wide = {2018: wide_year(2018, ["S1", "S2"], 3), 2019: wide_year(2019, ["S1", "S2"], 4)}
+    wide[2019]["S2"] = np.nan
+
+    streamed = stream_aggregate(wide, wide.get, stations, chunk_hours=500)
+
+    assert set(streamed["df_ex4"]["station"]) == {"S1"}
+
+
+def test_daily_cube_round_trip_answers_other_thresholds(tmp_path):
+    combined = hourly_frame()
+    path = write_daily_cube(aggregate_all(combined)["daily"], tmp_path / "daily.parquet")
+
+    cube = read_daily_cube(path)
+    from_cube = cube_tables(cube, threshold=30)
+    from_hourly = aggregate_all(combined, threshold=30)
+
+    assert cube["station"].dtype == "category"
+    assert cube["PM2.5"].dtype == "float32"
+    pd.testing.assert_frame_equal(from_cube["df_ex4"], from_hourly["df_ex4"])
+    pd.testing.assert_frame_equal(from_cube["monthly_PM25"], from_hourly["monthly_PM25"], rtol=1e-6)
+    assert len(read_daily_cube(path, filters=[("station", "==", "S1")])) == 90
+
+
+def test_min_coverage_drops_sparse_days_and_months():
+    hours = pd.date_range("2018-01-01", "2018-02-28 23:00", freq="h")
+    combined = pd.DataFrame({
+        "year": np.int16(2018),
+        "station": "S1",
+        "city": "X",
+        "date": hours.normalize(),
+        "PM2.5": np.float32(10.0),
+    })
+    # 1 Jan: only 10 valid hours, all high; February: 20 of 28 days missing
+    jan1 = combined["date"] == "2018-01-01"
+    combined.loc[jan1, "PM2.5"] = np.where(hours[jan1].hour < 10, 100.0, np.nan)
+    combined.loc[combined["date"] >= "2018-02-09", "PM2.5"] = np.nan
+
+    loose = aggregate_all(combined, threshold=15)
+    strict = aggregate_all(combined, threshold=15, min_coverage=0.75)
+
+    assert loose["df_ex4"]["exceeded"].iloc[0] == 1
+    assert strict["df_ex4"]["exceeded"].iloc[0] == 0
+    assert strict["df_ex4"]["n_days"].iloc[0] == 30 + 8
+    assert strict["monthly_PM25"]["month"].tolist() == [1]
+    assert strict["monthly_PM25"]["PM2.5"].iloc[0] == pytest.approx(10.0)
+    assert strict["monthly_PM25"]["n_days"].iloc[0] == 30
+    assert loose["monthly_PM25"]["n_hours"].tolist() == [10 + 30 * 24, 8 * 24]
+    assert not strict["daily"]["valid"].iloc[0]
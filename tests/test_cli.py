@@ -0,0 +1,65 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+import cli
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_quick_commands_do_not_import_heavy_modules(tmp_path):
+    code = (
+        "import sys, cli; cli.main(['years']); cli.main(['stats']); "
+        "print(sorted(m for m in ('pandas', 'numpy', 'matplotlib', 'seaborn', 'plotly') "
+        "if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True,
+                         text=True, check=True, env={"PYTHONPATH": str(ROOT / "src")})
+
+    assert out.stdout.splitlines()[-1] == "[]"
+
+
+def test_scripts_are_import_safe(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for script in ("01_download", "02_data_cleanining"):
+        __import__(script)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cached_datasets_and_stage_summary(tmp_path):
+    (tmp_path / "clean2015-0123abcd.parquet").write_bytes(b"x")
+    (tmp_path / "clean-2018_PM25_1g-89abcdef.parquet").write_bytes(b"xy")
+    stats = tmp_path / "stages.jsonl"
+    stats.write_text("".join(
+        json.dumps({"run": run, "stage": stage}) + "\n"
+        for run, stage in [("a", "clean/2015"), ("b", "clean/2018"), ("b", "write")]
+    ))
+
+    assert cli.cached_datasets(tmp_path) == [("2015", 1), ("2018_PM25_1g", 2)]
+    assert [r["stage"] for r in cli.stage_summary(stats)] == ["clean/2018", "write"]
+    assert [r["stage"] for r in cli.stage_summary(stats, run="a")] == ["clean/2015"]
+
+
+def test_aggregate_rebuilds_tables_from_cube(tmp_path):
+    from aggregate import DAILY_CUBE, write_daily_cube
+
+    daily = pd.DataFrame({
+        "year": 2018,
+        "station": pd.Categorical(["A", "A", "B"]),
+        "city": pd.Categorical(["Warszawa", "Warszawa", "Katowice"]),
+        "date": pd.to_datetime(["2018-01-01", "2018-01-02", "2018-01-01"]),
+        "PM2.5": pd.Series([30.0, 10.0, 20.0], dtype="float32"),
+        "n_hours": pd.Series([24, 24, 24], dtype="int16"),
+    })
+    write_daily_cube(daily, tmp_path / DAILY_CUBE)
+
+    tables = cli.aggregate(15, cube_path=tmp_path / DAILY_CUBE, out_dir=tmp_path / "out")
+
+    assert dict(zip(tables["df_ex4"]["station"], tables["df_ex4"]["exceeded"])) == {"A": 1, "B": 1}
+    assert {p.name for p in (tmp_path / "out").iterdir()} == {
+        "monthly_PM25.parquet", "df_ex2.parquet", "df_ex4.parquet"
+    }
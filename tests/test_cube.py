@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+from aggregate import aggregate_all
+from cube import PM25Cube, aggregate_cubes, combine_cubes, hour_slots
+from stations import StationIndex
+
+
+def station_index():
+    return StationIndex.from_metadata(pd.DataFrame({
+        "Kod stacji": ["S1", "S2", "S3"],
+        "Miejscowość": ["Warszawa", "Katowice", "Warszawa"],
+    }))
+
+
+def test_hour_slots_round_drift_and_reject_other_years():
+    times = pd.to_datetime([
+        "2018-01-01 01:00:00", "2018-01-02 00:00:40", "2018-12-31 23:59:50",
+        "2019-01-01 01:00:00", None,
+    ])
+
+    assert hour_slots(times, 2018).tolist() == [0, 23, 8759, -1, -1]
+
+
+def test_from_wide_places_rows_on_hour_grid():
+    wide = pd.DataFrame({
+        "Datetime": pd.to_datetime(["2018-01-01 01:00", "2018-01-01 03:00", "2018-01-02 00:00"]),
+        "S1": ["1,5", "2", ""],
+        "S2": [4.0, np.nan, 6.0],
+    })
+
+    cube = PM25Cube.from_wide(wide, 2018, station_index())
+
+    assert cube.values.shape == (2, 365 * 24) and cube.values.dtype == np.float32
+    assert cube.values[0, 0] == 1.5 and np.isnan(cube.values[0, 1]) and cube.values[0, 2] == 2.0
+    assert cube.values[1, 23] == 6.0
+    assert cube.cities.tolist() == ["Warszawa", "Katowice"]
+    # the midnight reading closes day 0
+    assert cube.daily_means()[1, 0] == 5.0
+
+
+def test_statistics_match_long_frame_aggregation(wide_year, long_combined):
+    stations = station_index()
+    wide = {2018: wide_year(2018, ["S1", "S2", "S3"], 1)}
+    cube = PM25Cube.from_wide(wide[2018], 2018, stations)
+    tables = aggregate_all(long_combined(wide, stations), threshold=25)
+
+    monthly = tables["monthly_PM25"].pivot(index="station", columns="month", values="PM2.5")
+    np.testing.assert_allclose(cube.monthly_means(), monthly.loc[cube.stations].to_numpy(),
+                               rtol=1e-6)
+    assert cube.exceedance_counts(25).tolist() == tables["df_ex4"]["exceeded"].tolist()
+
+    cities, city_means = cube.city_means()
+    df_ex2 = tables["df_ex2"].pivot(index="city", columns="month", values="PM2.5")
+    np.testing.assert_allclose(city_means, df_ex2.loc[cities].to_numpy(), rtol=1e-6)
+
+
+def test_coverage_rule_matches_tables_from_daily(wide_year, long_combined):
+    stations = station_index()
+    wide = {2018: wide_year(2018, ["S1", "S2"], 3)}
+    wide[2018].iloc[:20 * 24 + 12, 1] = np.nan
+    wide[2018].iloc[::3, 2] = np.nan
+    cube = PM25Cube.from_wide(wide[2018], 2018, stations)
+    tables = aggregate_all(long_combined(wide, stations), min_coverage=0.75)
+
+    monthly = tables["monthly_PM25"].pivot(index="station", columns="month", values="PM2.5")
+    np.testing.assert_allclose(cube.monthly_means(0.75),
+                               monthly.reindex(index=cube.stations, columns=range(1, 13)),
+                               rtol=1e-6)
+    assert cube.exceedance_counts(min_coverage=0.75).tolist() == tables["df_ex4"]["exceeded"].tolist()
+
+
+def test_long_round_trip(wide_year):
+    stations = station_index()
+    wide = wide_year(2018, ["S2", "S1"], 4)
+    cube = PM25Cube.from_wide(wide, 2018, stations)
+
+    back = PM25Cube.from_long(cube.to_long())
+
+    assert back.stations.tolist() == ["S2", "S1"]
+    np.testing.assert_array_equal(back.values, cube.values)
+    assert back.cities.tolist() == cube.cities.tolist()
+
+
+def test_multi_year_cubes_reproduce_long_pipeline(wide_year, long_combined):
+    stations = station_index()
+    wide = {2018: wide_year(2018, ["S1", "S2"], 5), 2019: wide_year(2019, ["S2", "S3", "S1"], 6)}
+    cubes = [PM25Cube.from_wide(df, year, stations) for year, df in wide.items()]
+    combined = long_combined(wide, stations)
+
+    pd.testing.assert_frame_equal(combine_cubes(stations, *cubes), combined, check_categorical=False)
+
+    expected = aggregate_all(combined, threshold=20)
+    tables = aggregate_cubes(*cubes, threshold=20)
+    for name in ("daily", "monthly_PM25", "df_ex2", "df_ex4"):
+        pd.testing.assert_frame_equal(tables[name], expected[name], check_categorical=False)
+
+
+def test_station_policy_matches_long_pipeline(wide_year, long_combined):
+    stations = station_index()
+    wide = {2018: wide_year(2018, ["S1", "S2"], 7), 2019: wide_year(2019, ["S2", "S3"], 8)}
+    cubes = [PM25Cube.from_wide(df, year, stations) for year, df in wide.items()]
+    combined = long_combined(wide, stations, station_policy="union")
+
+    tables = aggregate_cubes(*cubes, station_policy="union")
+
+    assert set(tables["df_ex4"]["station"]) == {"S1", "S2", "S3"}
+    expected = aggregate_all(combined)
+    pd.testing.assert_frame_equal(tables["df_ex4"], expected["df_ex4"], check_categorical=False)
+    pd.testing.assert_frame_equal(combine_cubes(stations, *cubes, station_policy="union"),
+                                  combined, check_categorical=False)
+
+
+def test_combine_cubes_keeps_stations_by_policy():
+    stations = station_index()
+
+    def year_cube(year, codes):
+        wide = pd.DataFrame({"Datetime": [pd.Timestamp(f"{year}-01-01 01:00")],
+                             **{code: [10.0] for code in codes}})
+        return PM25Cube.from_wide(wide, year, stations)
+
+    cubes = [year_cube(2015, ["S1", "S2"]), year_cube(2018, ["S2", "S3"])]
+
+    combined = combine_cubes(stations, *cubes)
+    assert set(combined["station"]) == {"S2"}
+    assert "Datetime" not in combined.columns
+
+    union = combine_cubes(stations, *cubes, station_policy="union")
+    assert union.groupby("station", observed=True)["year"].apply(list).to_dict() == {
+        "S1": [2015], "S2": [2015, 2018], "S3": [2018]
+    }
+
+
+def test_station_without_readings_in_a_year_is_not_present(wide_year, long_combined):
+    stations = station_index()
+    wide = {2018: wide_year(2018, ["S1", "S2"], 9), 2019: wide_year(2019, ["S1", "S2"], 10)}
+    wide[2019]["S2"] = np.nan
+    cubes = [PM25Cube.from_wide(df, year, stations) for year, df in wide.items()]
+
+    combined = combine_cubes(stations, *cubes)
+
+    assert set(combined["station"]) == {"S1"}
+    assert set(aggregate_cubes(*cubes)["df_ex4"]["station"]) == {"S1"}
+    pd.testing.assert_frame_equal(combined, long_combined(wide, stations),
+                                  check_categorical=False)
@@ -0,0 +1,131 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from downloader import download_archives, fetch_archive, make_session
+
+
+# -------------------- local stand-in for the GIOŚ server --------------------
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    files = {}
+    requests_log = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send_headers(self, body, status=200, extra=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", f'"{hash(body)}"')
+        self.send_header("Accept-Ranges", "bytes")
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        body = self.files[self.path]
+        self.requests_log.append(("HEAD", self.path, None))
+        self._send_headers(body)
+
+    def do_GET(self):
+        body = self.files[self.path]
+        range_header = self.headers.get("Range")
+        self.requests_log.append(("GET", self.path, range_header))
+
+        if range_header:
+            start = int(range_header.removeprefix("bytes=").rstrip("-"))
+            if start >= len(body):
+                self._send_headers(b"", status=416, extra={
+                    "Content-Range": f"bytes */{len(body)}"
+                })
+                return
+            chunk = body[start:]
+            self._send_headers(chunk, status=206, extra={
+                "Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"
+            })
+            self.wfile.write(chunk)
+        else:
+            self._send_headers(body)
+            self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    ArchiveHandler.files = {
+        "/2015": b"zip-2015" * 5000,
+        "/2018": b"zip-2018" * 7000,
+    }
+    ArchiveHandler.requests_log = []
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def gets(path):
+    return [r for r in ArchiveHandler.requests_log if r[0] == "GET" and r[1] == path]
+
+
+# -------------------- tests --------------------
+
+def test_download_archives_fetches_all_years(server, tmp_path):
+    paths = download_archives(
+        {2015: f"{server}/2015", 2018: f"{server}/2018"}, tmp_path, workers=2
+    )
+
+    assert paths[2015].read_bytes() == ArchiveHandler.files["/2015"]
+    assert paths[2018].read_bytes() == ArchiveHandler.files["/2018"]
+
+
+def test_fetch_archive_skips_unchanged_archive(server, tmp_path):
+    session = make_session()
+    fetch_archive(session, f"{server}/2015", tmp_path / "2015.zip")
+    fetch_archive(session, f"{server}/2015", tmp_path / "2015.zip")
+
+    assert len(gets("/2015")) == 1
+
+
+def test_fetch_archive_redownloads_changed_archive(server, tmp_path):
+    session = make_session()
+    fetch_archive(session, f"{server}/2015", tmp_path / "2015.zip")
+
+    ArchiveHandler.files["/2015"] = b"new-2015" * 100
+    path = fetch_archive(session, f"{server}/2015", tmp_path / "2015.zip")
+
+    assert path.read_bytes() == b"new-2015" * 100
+    assert len(gets("/2015")) == 2
+
+
+def test_fetch_archive_resumes_partial_download(server, tmp_path):
+    body = ArchiveHandler.files["/2018"]
+    (tmp_path / "2018.zip.part").write_bytes(body[:1000])
+
+    path = fetch_archive(make_session(), f"{server}/2018", tmp_path / "2018.zip")
+
+    assert path.read_bytes() == body
+    assert gets("/2018") == [("GET", "/2018", "bytes=1000-")]
+    assert not (tmp_path / "2018.zip.part").exists()
+
+
+def test_fetch_archive_restarts_oversized_partial_download(server, tmp_path):
+    body = ArchiveHandler.files["/2015"]
+    (tmp_path / "2015.zip.part").write_bytes(body + b"garbage")
+
+    path = fetch_archive(make_session(), f"{server}/2015", tmp_path / "2015.zip")
+
+    assert path.read_bytes() == body
+    assert gets("/2015") == [("GET", "/2015", f"bytes={len(body) + 7}-"), ("GET", "/2015", None)]
+
+
+def test_fetch_archive_keeps_complete_partial_download(server, tmp_path):
+    body = ArchiveHandler.files["/2015"]
+    (tmp_path / "2015.zip.part").write_bytes(body)
+
+    path = fetch_archive(make_session(), f"{server}/2015", tmp_path / "2015.zip")
+
+    assert path.read_bytes() == body
+    assert gets("/2015") == [("GET", "/2015", f"bytes={len(body)}-")]
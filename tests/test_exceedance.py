@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregate import aggregate_all
+from exceedance import ExceedanceIndex
+from utils import plot_exceeded_days_top_bottom
+
+
+@pytest.fixture
+def daily():
+    rng = np.random.default_rng(3)
+    frames = []
+    for year in (2018, 2019):
+        dates = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="D")
+        for station, city in [("S1", "Warszawa"), ("S2", "Katowice"), ("S3", "Kraków")]:
+            frames.append(pd.DataFrame({
+                "year": np.int16(year),
+                "station": station,
+                "city": city,
+                "date": dates,
+                "PM2.5": rng.gamma(2.0, 10.0, len(dates)).astype("float32"),
+            }))
+    out = pd.concat(frames, ignore_index=True)
+    for column in ("station", "city"):
+        out[column] = out[column].astype("category")
+    return out
+
+
+def brute_force(daily, threshold):
+    return (daily["PM2.5"] > threshold).groupby(
+        [daily["year"], daily["station"]], observed=True
+    ).sum().to_numpy()
+
+
+def test_exceedance_counts_match_brute_force(daily):
+    index = ExceedanceIndex.from_daily(daily)
+
+    for threshold in (0, 15, 22.5, 40, 1000):
+        counts = index.exceedance_counts(threshold)
+        assert counts["exceeded"].tolist() == brute_force(daily, threshold).tolist()
+
+
+def test_exceedance_counts_exact_at_float32_values(daily):
+    index = ExceedanceIndex.from_daily(daily)
+    values = daily["PM2.5"].to_numpy()[:50].astype(np.float64)
+
+    # the thresholds sit exactly on, just below and just above stored float32 means
+    for threshold in np.concatenate([values, values - 1e-9, values + 1e-9, [-5.0, -0.0]]):
+        counts = index.exceedance_counts(threshold)
+        assert counts["exceeded"].tolist() == brute_force(daily, threshold).tolist()
+
+
+def test_exceedance_counts_filter_years_and_stations(daily):
+    index = ExceedanceIndex.from_daily(daily)
+
+    counts = index.exceedance_counts(15, years=2019, stations=["S1", "S3"])
+
+    assert counts[["year", "station"]].astype(str).values.tolist() == [
+        ["2019", "S1"], ["2019", "S3"]
+    ]
+
+
+def test_exceedance_curve_is_non_increasing(daily):
+    index = ExceedanceIndex.from_daily(daily)
+
+    curve = index.exceedance_curve(np.arange(0, 100, 5), stations="S2")
+
+    for _, group in curve.groupby("year"):
+        assert (np.diff(group["exceeded"].to_numpy()) <= 0).all()
+    assert len(curve) == 2 * 20
+
+
+def test_exceedance_index_agrees_with_aggregate_all():
+    hours = pd.date_range("2018-01-01", periods=24 * 40, freq="h")
+    combined = pd.DataFrame({
+        "year": np.int16(2018),
+        "station": "S1",
+        "city": "X",
+        "date": hours.normalize(),
+        "PM2.5": np.linspace(0, 40, len(hours)).astype("float32"),
+    })
+    tables = aggregate_all(combined, threshold=15)
+
+    counts = ExceedanceIndex.from_daily(tables["daily"]).exceedance_counts(15)
+
+    assert counts["exceeded"].tolist() == tables["df_ex4"]["exceeded"].tolist()
+
+
+def test_plot_takes_threshold_with_index(daily):
+    index = ExceedanceIndex.from_daily(daily)
+
+    fig = plot_exceeded_days_top_bottom(index, year=2019, top_n=1, threshold=30)
+
+    assert "30" in fig.layout.title.text
+    with pytest.raises(ValueError):
+        plot_exceeded_days_top_bottom(index.exceedance_counts(), threshold=30)
+
+
+def test_exceedance_index_keeps_station_years_without_valid_days():
+    hours = pd.date_range("2018-01-01", periods=24 * 10, freq="h")
+    combined = pd.DataFrame({
+        "year": np.int16(2018),
+        "station": np.repeat(["S1", "S2"], len(hours)),
+        "city": "X",
+        "date": np.tile(hours.normalize(), 2),
+        "PM2.5": np.tile(np.linspace(0, 40, len(hours)), 2).astype("float32"),
+    })
+    # S2 reports only 6 hours a day
+    combined = combined[(combined["station"] == "S1") | (np.tile(hours.hour, 2) < 6)]
+    for column in ("station", "city"):
+        combined[column] = combined[column].astype("category")
+    tables = aggregate_all(combined, threshold=15, min_coverage=0.75)
+
+    counts = ExceedanceIndex.from_daily(tables["daily"], min_coverage=0.75).exceedance_counts(15)
+
+    pd.testing.assert_frame_equal(counts, tables["df_ex4"])
+    assert counts.set_index("station").loc["S2", ["exceeded", "n_days"]].tolist() == [0, 0]
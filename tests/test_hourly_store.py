@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import PM25Cube
+from hourly_store import HourlyStore, open_cube, write_cube
+
+
+def make_cube(year, stations, cities, seed):
+    rng = np.random.default_rng(seed)
+    n_hours = len(pd.date_range(f"{year}-01-01", f"{year + 1}-01-01", freq="h")) - 1
+    values = rng.gamma(2.0, 10.0, (len(stations), n_hours)).astype(np.float32)
+    return PM25Cube(year, pd.Index(stations), np.array(cities, dtype=object), values)
+
+
+@pytest.fixture
+def store(tmp_path):
+    write_cube(make_cube(2018, ["S1", "S2"], ["Warszawa", np.nan], 1), tmp_path)
+    write_cube(make_cube(2019, ["S2", "S3", "S1"], ["Katowice", "Warszawa", "Warszawa"], 2),
+               tmp_path)
+    return HourlyStore(tmp_path)
+
+
+def test_round_trip_is_memory_mapped(tmp_path):
+    cube = make_cube(2020, ["S1", "S2"], ["Warszawa", np.nan], 3)
+    write_cube(cube, tmp_path)
+
+    back = open_cube(2020, tmp_path)
+
+    assert isinstance(back.values, np.memmap) and back.values.shape == (2, 366 * 24)
+    np.testing.assert_array_equal(back.values, cube.values)
+    assert back.stations.tolist() == ["S1", "S2"]
+    assert back.cities[0] == "Warszawa" and pd.isna(back.cities[1])
+
+
+def test_read_station_range_across_years(store):
+    s2018, s2019 = store.cube(2018), store.cube(2019)
+
+    frame = store.read(stations=["S1", "S3"], start="2018-12-31 23:00", end="2019-01-01 02:00")
+
+    assert frame.index.tolist() == list(pd.date_range("2018-12-31 23:00", periods=4, freq="h"))
+    np.testing.assert_array_equal(frame["S1"], [*s2018.values[0, -2:], *s2019.values[2, :2]])
+    # S3 has no 2018 block
+    assert frame["S3"].iloc[:2].isna().all()
+    np.testing.assert_array_equal(frame["S3"].iloc[2:], s2019.values[1, :2])
+
+
+def test_read_city(store):
+    assert store.years() == [2018, 2019]
+    assert store.stations(cities="Warszawa") == ["S1", "S3"]
+
+    frame = store.read(cities="Katowice", years=[2019], end="2019-01-02 00:00")
+
+    assert frame.columns.tolist() == ["S2"] and len(frame) == 24
+    np.testing.assert_array_equal(frame["S2"], store.cube(2019).values[0, :24])
+
+
+def backed_by_memmap(frame):
+    base = frame.to_numpy()
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    return base is not None
+
+
+def test_read_contiguous_stations_is_a_view(store):
+    # 2019 rows are S2, S3, S1
+    assert backed_by_memmap(store.read(stations=["S2", "S3"], years=[2019]))
+    assert backed_by_memmap(store.read(years=[2019], end="2019-02-01"))
+    assert not backed_by_memmap(store.read(stations=["S1", "S2"], years=[2019]))
+
+
+def test_read_lists_each_station_once(store):
+    frame = store.read(stations=["S1", "S1"], cities="Warszawa", years=[2019])
+
+    assert frame.columns.tolist() == ["S1", "S3"]
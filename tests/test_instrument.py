@@ -0,0 +1,72 @@
+import json
+
+import pandas as pd
+import pytest
+
+from instrument import StageRecorder
+from pipeline import Pipeline
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_stage_writes_json_line(tmp_path):
+    recorder = StageRecorder(tmp_path / "stages.jsonl")
+
+    with recorder.stage("load", rows_in=10) as record:
+        record["rows_out"] = 7
+
+    (line,) = read_records(tmp_path / "stages.jsonl")
+    assert line["stage"] == "load"
+    assert (line["rows_in"], line["rows_out"]) == (10, 7)
+    assert line["wall_s"] >= 0 and line["cpu_s"] >= 0
+    assert "peak_rss_mib" in line
+
+
+def test_call_counts_rows_and_records_errors(tmp_path):
+    recorder = StageRecorder(tmp_path / "stages.jsonl")
+    frame = pd.DataFrame({"a": range(5)})
+
+    @recorder.wrap("head")
+    def head(df, n):
+        return df.head(n)
+
+    assert len(head(frame, 3)) == 3
+    with pytest.raises(ZeroDivisionError):
+        recorder.call("broken", lambda: 1 / 0)
+
+    ok, broken = read_records(tmp_path / "stages.jsonl")
+    assert (ok["rows_in"], ok["rows_out"]) == (5, 3)
+    assert "ZeroDivisionError" in broken["error"]
+
+
+def test_profiled_stage_dumps_prof_file(tmp_path):
+    recorder = StageRecorder(tmp_path / "stages.jsonl", profile=["slow"], profile_dir=tmp_path)
+
+    recorder.call("slow", sum, range(1000))
+    recorder.call("fast", sum, range(10))
+
+    slow, fast = read_records(tmp_path / "stages.jsonl")
+    assert (tmp_path / "slow.prof").exists()
+    assert slow["profile"].endswith("slow.prof")
+    assert "profile" not in fast
+
+
+def test_pipeline_records_computed_nodes(tmp_path):
+    recorder = StageRecorder(tmp_path / "stages.jsonl")
+    pipe = Pipeline(tmp_path / "cache", recorder=recorder)
+    pipe.add("frame", pd.DataFrame, params={"data": {"a": [1, 2, 3]}})
+    pipe.add("tail", pd.DataFrame.tail, deps=("frame",), params={"n": 1})
+
+    pipe.run(["tail"])
+
+    records = read_records(tmp_path / "stages.jsonl")
+    assert [r["stage"] for r in records] == ["frame", "tail"]
+    assert records[1]["rows_in"] == 3 and records[1]["rows_out"] == 1
+
+
+def test_call_passes_name_keyword_through(tmp_path):
+    recorder = StageRecorder(tmp_path / "stages.jsonl")
+
+    assert recorder.call("pick", lambda tables, name: tables[name], {"a": 1}, name="a") == 1
@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 import pytest
 
-from means import make_trend_df, prepare_ex3_heatmap_df, prepare_voivodeship_stats
+from means import HeatmapCube, make_trend_df, prepare_ex3_heatmap_df, prepare_voivodeship_stats
+from stations import StationIndex
 
 
 def test_make_trend_df_filters_years_and_sorts():
@@ -54,6 +56,25 @@ def test_prepare_ex3_heatmap_df_missing_columns_raises():
     with pytest.raises(ValueError):
         prepare_ex3_heatmap_df(bad)
 
+
+def test_heatmap_cube_pivots_all_cities_at_once():
+    df_ex3 = pd.DataFrame({
+        "city": ["B", "A", "A"],
+        "year": [2018, 2015, 2018],
+        "month": [12, 1, 2],
+        "PM2.5": [3.0, 1.0, 2.0],
+    })
+
+    cube = HeatmapCube.from_df(df_ex3)
+
+    assert (cube.cities, cube.years) == (["A", "B"], [2015, 2018])
+    assert cube.values.shape == (2, 2, 12)
+    assert (cube.values[0, 0, 0], cube.values[0, 1, 1], cube.values[1, 1, 11]) == (1.0, 2.0, 3.0)
+    assert np.isnan(cube.values).sum() == 2 * 2 * 12 - 3
+
+    picked = cube.select(["B", "X"])
+    assert picked.values[0, 1, 11] == 3.0 and np.isnan(picked.values[1]).all()
+
 @pytest.fixture
 def df_ex4_small() -> pd.DataFrame:
     # Mini zestaw danych do testów
@@ -93,3 +114,12 @@ def test_prepare_voivodeship_stats_detects_shuffle(df_ex4_small, meta_df_small):
         # Jeśli wartości nie zgadzają się dokładnie -> fail
         assert abs(stat_row["avg_exceeded_days"].values[0] - row["avg_exceeded_days"]) < 1e-6, \
             f"Detected unexpected shuffling in {row['Województwo']} year {row['year']}"
+
+
+def test_prepare_voivodeship_stats_accepts_station_index(df_ex4_small, meta_df_small):
+    from_frame = prepare_voivodeship_stats(df_ex4_small, meta_df_small)
+    from_index = prepare_voivodeship_stats(
+        df_ex4_small, StationIndex.from_metadata(meta_df_small)
+    )
+
+    pd.testing.assert_frame_equal(from_index, from_frame)
@@ -0,0 +1,118 @@
+import pandas as pd
+import pytest
+
+import pipeline as pipeline_module
+from pipeline import Pipeline, build_cleaning_pipeline
+
+
+def read_number(path):
+    return int(open(path).read())
+
+
+def add(a, b):
+    return a + b
+
+
+def double(x):
+    return 2 * x
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text("1")
+    b.write_text("10")
+    return a, b
+
+
+def build(tmp_path, a, b):
+    pipe = Pipeline(tmp_path / "nodes")
+    pipe.add("a", read_number, params={"path": str(a)}, files=(a,))
+    pipe.add("b", read_number, params={"path": str(b)}, files=(b,))
+    pipe.add("a2", double, deps=("a",), branch=True)
+    pipe.add("b2", double, deps=("b",), branch=True)
+    pipe.add("total", add, deps=("a2", "b2"))
+    return pipe
+
+
+def test_pipeline_second_run_uses_cache(tmp_path, inputs):
+    first = build(tmp_path, *inputs)
+    assert first.get("total") == 22
+
+    second = build(tmp_path, *inputs)
+    assert second.get("total") == 22
+    assert second.computed == []
+
+
+def test_pipeline_recomputes_only_invalidated_nodes(tmp_path, inputs):
+    a, b = inputs
+    build(tmp_path, a, b).get("total")
+
+    b.write_text("20")
+    pipe = build(tmp_path, a, b)
+
+    assert pipe.get("total") == 42
+    assert pipe.computed == ["b", "b2", "total"]
+
+
+def test_pipeline_version_invalidates_every_node(tmp_path, inputs, monkeypatch):
+    build(tmp_path, *inputs).get("total")
+
+    monkeypatch.setattr(pipeline_module, "PIPELINE_VERSION", "test")
+    pipe = build(tmp_path, *inputs)
+
+    assert pipe.get("total") == 22
+    assert sorted(pipe.computed) == ["a", "a2", "b", "b2", "total"]
+
+
+def test_pipeline_parallel_branches_match_sequential(tmp_path, inputs):
+    pipe = build(tmp_path, *inputs)
+
+    result = pipe.run(["total"], workers=2)
+
+    assert result["total"] == 22
+    assert sorted(pipe.computed) == ["a", "a2", "b", "b2", "total"]
+    assert pipe.is_cached("a2") and pipe.is_cached("b2")
+
+
+def test_pipeline_rejects_unknown_dependency(tmp_path):
+    pipe = Pipeline(tmp_path)
+    with pytest.raises(KeyError):
+        pipe.add("x", double, deps=("missing",))
+
+
+def write_raw_year(raw_dir, year):
+    hours = pd.date_range(f"{year}-01-01 01:00", periods=48, freq="h")
+    rows = [
+        ["Nr", 1, 2],
+        ["Kod stacji", "ST01", "ST02"],
+        ["Wskaźnik", "PM2.5", "PM2.5"],
+        ["Czas uśredniania", "1g", "1g"],
+        ["Jednostka", "ug/m3", "ug/m3"],
+        ["Czas pomiaru", "ST01-PM2.5", "ST02-PM2.5"],
+    ] + [[str(t), f"{10 + i % 30},5", str(20 + i)] for i, t in enumerate(hours)]
+    pd.DataFrame(rows).to_csv(raw_dir / f"raw{year}.csv")
+
+
+def test_cleaning_pipeline_in_worker_processes_matches_sequential(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    for year in (2015, 2018):
+        write_raw_year(raw_dir, year)
+    metadata_path = tmp_path / "Metadata.xlsx"
+    pd.DataFrame({
+        "Kod stacji": ["ST01", "ST02"],
+        "Miejscowość": ["Warszawa", "Katowice"],
+    }).to_excel(metadata_path, index=False)
+
+    targets = ["monthly_PM25", "df_ex2", "df_ex4"]
+    sequential = build_cleaning_pipeline([2015, 2018], raw_dir, metadata_path,
+                                         cache_dir=tmp_path / "seq").run(targets)
+    pipe = build_cleaning_pipeline([2015, 2018], raw_dir, metadata_path,
+                                   cache_dir=tmp_path / "par")
+    parallel = pipe.run(targets, workers=2)
+
+    assert {"cube/2015", "cube/2018"} <= set(pipe.computed)
+    for name in targets:
+        pd.testing.assert_frame_equal(parallel[name], sequential[name])
+    assert set(parallel["df_ex4"]["station"]) == {"ST01", "ST02"}
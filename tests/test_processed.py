@@ -0,0 +1,52 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from processed import read_table, table_metadata, write_table
+
+
+def monthly():
+    return pd.DataFrame({
+        "year": pd.Series([2018, 2015, 2018, 2015, 2018], dtype="int16"),
+        "month": pd.Series([1, 1, 1, 2, 2], dtype="int8"),
+        "station": pd.Categorical(["A", "A", "B", "C", "A"]),
+        "city": pd.Categorical(["Warszawa", "Warszawa", "Katowice", "Kraków", "Warszawa"]),
+        "PM2.5": pd.Series([30.0, 10.0, 20.0, 5.0, 7.5], dtype="float32"),
+    })
+
+
+def test_round_trip_keeps_types_and_metadata(tmp_path):
+    df = monthly()
+    write_table(df, "monthly_PM25", tmp_path)
+
+    back = read_table("monthly_PM25", tmp_path)
+
+    expected = df.sort_values(["year", "city"], kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(back, expected)
+    meta = table_metadata("monthly_PM25", tmp_path)
+    assert meta["sorted_by"] == ["year", "city"] and meta["units"] == {"PM2.5": "µg/m³"}
+    assert not (tmp_path / "monthly_PM25.csv").exists()
+
+
+def test_row_groups_follow_year_and_city(tmp_path):
+    write_table(monthly(), "monthly_PM25", tmp_path, row_group_rows=2)
+
+    groups = pq.ParquetFile(tmp_path / "monthly_PM25.parquet").metadata
+    years = [groups.row_group(i).column(0).statistics for i in range(groups.num_row_groups)]
+    # (2015 Kraków, Warszawa) | (2018 Katowice) | (2018 Warszawa x 2)
+    assert [(s.min, s.max) for s in years] == [(2015, 2015), (2018, 2018), (2018, 2018)]
+
+    back = read_table("monthly_PM25", tmp_path, columns=["year", "PM2.5"],
+                      years=2018, cities=["Warszawa"])
+    assert back.columns.tolist() == ["year", "PM2.5"]
+    assert back["PM2.5"].tolist() == [30.0, 7.5]
+
+
+def test_csv_export_and_fallback(tmp_path):
+    df = monthly()
+    write_table(df, "df_ex2", tmp_path, csv=True)
+    (tmp_path / "df_ex2.parquet").unlink()
+
+    back = read_table("df_ex2", tmp_path, columns=["station", "PM2.5"], cities="Warszawa")
+
+    assert back["station"].tolist() == ["A", "A", "A"]
+    assert back["PM2.5"].tolist() == [30.0, 10.0, 7.5]
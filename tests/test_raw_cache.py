@@ -0,0 +1,146 @@
+import zipfile
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import raw_cache
+from raw_cache import (
+    load_clean_archive,
+    load_clean_year,
+    stream_xlsx_to_parquet,
+    to_typed_wide
+)
+from utils import clean_gios_df
+
+
+@pytest.fixture
+def raw_csv(tmp_path):
+    # surowe dane w formacie po 2015 z przecinkami dziesiętnymi
+    raw = pd.DataFrame([
+        ["Nr", 1, 2],
+        ["Kod stacji", "ST01", "ST02"],
+        ["Wskaźnik", "PM2.5", "PM2.5"],
+        ["Czas uśredniania", "1g", "1g"],
+        ["Jednostka", "ug/m3", "ug/m3"],
+        ["Czas pomiaru", "ST01-PM2.5", "ST02-PM2.5"],
+        ["2018-01-01 01:00:00", "10,5", "20,3"],
+        ["2018-01-01 02:00:00", "15,2", None],
+    ])
+    path = tmp_path / "raw2018.csv"
+    raw.to_csv(path)
+    return path
+
+
+def test_load_clean_year_returns_typed_frame(raw_csv, tmp_path):
+    clean = load_clean_year(2018, raw_csv, cache_dir=tmp_path / "cache")
+
+    assert list(clean.columns) == ["Datetime", "ST01", "ST02"]
+    assert clean["Datetime"].dtype.kind == "M"
+    assert clean["ST01"].dtype == "float32"
+    assert clean["ST01"].iloc[0] == pytest.approx(10.5)
+    assert pd.isna(clean["ST02"].iloc[1])
+
+
+def test_load_clean_year_skips_csv_parsing_on_cache_hit(raw_csv, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    load_clean_year(2018, raw_csv, cache_dir=cache_dir)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("raw CSV parsed despite valid cache")
+
+    monkeypatch.setattr(raw_cache.pd, "read_csv", fail)
+    clean = load_clean_year(2018, raw_csv, cache_dir=cache_dir, columns=["ST02"])
+
+    assert list(clean.columns) == ["Datetime", "ST02"]
+
+
+def test_load_clean_year_rebuilds_when_source_changes(raw_csv, tmp_path):
+    cache_dir = tmp_path / "cache"
+    load_clean_year(2018, raw_csv, cache_dir=cache_dir)
+
+    raw = pd.read_csv(raw_csv, index_col=0)
+    raw.iloc[6, 1] = "99,0"
+    raw.to_csv(raw_csv)
+    clean = load_clean_year(2018, raw_csv, cache_dir=cache_dir)
+
+    assert clean["ST01"].iloc[0] == pytest.approx(99.0)
+    assert len(list(cache_dir.glob("clean2018-*.parquet"))) == 1
+
+
+@pytest.fixture
+def archive(tmp_path):
+    # arkusz GIOŚ (format po 2015) spakowany do ZIP jak w archiwum GIOŚ
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in [
+        ["Nr", 1, 2],
+        ["Kod stacji", "ST01", "ST02"],
+        ["Wskaźnik", "PM2.5", "PM2.5"],
+        ["Czas uśredniania", "1g", "1g"],
+        ["Jednostka", "ug/m3", "ug/m3"],
+        ["Kod stanowiska", "ST01-PM2.5-1g", "ST02-PM2.5-1g"],
+    ]:
+        ws.append(row)
+    for hour in range(1, 6):
+        ws.append([datetime(2018, 1, 1, hour), hour * 1.5, "2,5" if hour % 2 else None])
+    xlsx = tmp_path / "2018_PM25_1g.xlsx"
+    wb.save(xlsx)
+
+    path = tmp_path / "2018.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        z.write(xlsx, "2018_PM25_1g.xlsx")
+    return path
+
+
+def test_load_clean_archive_matches_read_excel(archive, tmp_path):
+    clean = load_clean_archive(2018, archive, "2018_PM25_1g.xlsx", cache_dir=tmp_path / "cache")
+
+    with zipfile.ZipFile(archive) as z, z.open("2018_PM25_1g.xlsx") as f:
+        expected = to_typed_wide(clean_gios_df(pd.read_excel(f, header=None), 2018))
+
+    pd.testing.assert_frame_equal(clean, expected.reset_index())
+    assert clean["ST02"].dtype == "float32"
+
+
+def test_stream_xlsx_to_parquet_writes_row_groups(archive, tmp_path):
+    xlsx = tmp_path / "2018_PM25_1g.xlsx"
+    path = stream_xlsx_to_parquet(xlsx, 2018, tmp_path / "out.parquet", chunk_rows=2)
+
+    assert pq.ParquetFile(path).num_row_groups == 3
+    assert len(pd.read_parquet(path)) == 5
+
+
+def test_load_clean_archive_caches_each_sheet_separately(archive, tmp_path):
+    with zipfile.ZipFile(archive, "a") as z:
+        z.write(tmp_path / "2018_PM25_1g.xlsx", "2018_PM10_1g.xlsx")
+    cache_dir = tmp_path / "cache"
+
+    load_clean_archive(2018, archive, "2018_PM25_1g.xlsx", cache_dir=cache_dir)
+    load_clean_archive(2018, archive, "2018_PM10_1g.xlsx", cache_dir=cache_dir)
+
+    assert {p.name.split("-")[1] for p in cache_dir.glob("*.parquet")} == {
+        "2018_PM25_1g", "2018_PM10_1g"
+    }
+
+
+def test_stream_xlsx_to_parquet_skips_columns_without_code(tmp_path, caplog):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Kod stacji", "ST01", None, "ST03"])
+    ws.append(["Wskaźnik", "PM2.5", None, "PM2.5"])
+    ws.append(["Czas uśredniania", "1g", None, "1g"])
+    for hour in range(1, 5):
+        ws.append([datetime(2015, 1, 1, hour), hour, 99, None if hour % 2 else "1,5"])
+    xlsx = tmp_path / "2015_PM25_1g.xlsx"
+    wb.save(xlsx)
+
+    with caplog.at_level("INFO"):
+        path = stream_xlsx_to_parquet(xlsx, 2015, tmp_path / "out.parquet", header=(0, 3))
+
+    stored = pd.read_parquet(path)
+    assert list(stored.columns) == ["ST01", "ST03"]
+    assert stored["ST03"].tolist()[1::2] == [1.5, 1.5]
+    assert "  ST03: 50.00%" in caplog.messages
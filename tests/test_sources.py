@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import pytest
+
+from sources import Source, detect_header, registry
+
+
+def test_detect_header_before_and_after_2016_layouts():
+    layout_2015 = ["Kod stacji", "Wskaźnik", "Czas uśredniania", "2015-01-01 01:00:00"]
+    layout_2018 = ["Nr", "Kod stacji", "Wskaźnik", "Czas uśredniania", "Jednostka",
+                   "Kod stanowiska", datetime(2018, 1, 1, 1)]
+
+    assert detect_header(layout_2015) == (0, 3)
+    assert detect_header(layout_2018) == (1, 6)
+
+
+def test_detect_header_rejects_sheet_without_station_codes():
+    with pytest.raises(ValueError):
+        detect_header(["Nr", "Wskaźnik", "2018-01-01 01:00:00"])
+
+
+def test_registry_expands_years_pollutants_and_periods():
+    sources = registry([2018], pollutants=("PM25", "PM10"), periods=("1g", "24g"),
+                       archive_ids={2018: "603"})
+
+    assert [s.filename for s in sources] == [
+        "2018_PM25_1g.xlsx", "2018_PM25_24g.xlsx",
+        "2018_PM10_1g.xlsx", "2018_PM10_24g.xlsx",
+    ]
+    assert {s.url for s in sources} == {Source(2018, "603").url}
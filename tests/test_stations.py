@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+import stations as stations_module
+from stations import OLD_CODE_COLUMN, StationIndex, align_stations, load_station_index
+from utils import add_city, normalize_station_codes
+
+
+@pytest.fixture
+def metadata():
+    return pd.DataFrame({
+        "Kod stacji": ["ST01", "ST02", "ST03"],
+        "Miejscowość": ["Warszawa", "Katowice", "Kraków"],
+        "Województwo": ["MAZOWIECKIE", "ŚLĄSKIE", "MAŁOPOLSKIE"],
+        "WGS84 φ N": [52.2, 50.3, 50.1],
+        "WGS84 λ E": [21.0, 19.0, 19.9],
+        OLD_CODE_COLUMN: ["OLD001", None, "OLD003a, OLD003b"],
+    })
+
+
+def test_station_index_maps_every_listed_old_code(metadata):
+    index = StationIndex.from_metadata(metadata)
+
+    codes = index.normalize(["OLD001", "OLD003a", "OLD003b", "ST02", "UNKNOWN"])
+
+    assert list(codes) == ["ST01", "ST03", "ST03", "ST02", "UNKNOWN"]
+
+
+def test_station_index_vectorized_lookups(metadata):
+    index = StationIndex.from_metadata(metadata)
+
+    assert list(index.city(["ST02", "ST01"])) == ["Katowice", "Warszawa"]
+    assert list(index.voivodeship(["ST03"])) == ["MAŁOPOLSKIE"]
+    assert pd.isna(index.city(["UNKNOWN"])[0])
+    assert index.coordinates(["ST01"]).loc["ST01", "lat"] == 52.2
+
+
+def test_utils_accept_station_index_instead_of_metadata(metadata):
+    index = StationIndex.from_metadata(metadata)
+    wide = pd.DataFrame({"Datetime": ["2018-01-01 01:00:00"], "OLD001": [1.0], "ST02": [2.0]})
+    long = pd.DataFrame({"station": ["ST01", "ST03"]})
+
+    assert list(normalize_station_codes(wide, index).columns) == \
+        list(normalize_station_codes(wide, metadata).columns) == ["Datetime", "ST01", "ST02"]
+    assert list(add_city(long.copy(), index)["city"]) == ["Warszawa", "Kraków"]
+
+
+def test_load_station_index_reads_excel_once(metadata, tmp_path, monkeypatch):
+    path = tmp_path / "Metadata.xlsx"
+    metadata.to_excel(path, index=False)
+    first = load_station_index(path, cache_dir=tmp_path / "cache")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Metadata.xlsx read again despite cache")
+
+    monkeypatch.setattr(stations_module.pd, "read_excel", fail)
+    second = load_station_index(path, cache_dir=tmp_path / "cache")
+
+    pd.testing.assert_frame_equal(first.stations, second.stations)
+
+
+def test_align_stations_policies():
+    axes = {2015: ["S1", "S2", "S3"], 2018: ["S2", "S3"], 2021: ["S3", "S4", "S3"]}
+
+    common = align_stations(axes)
+    assert common.stations.tolist() == ["S3"]
+    assert common.dropped.index.tolist() == ["S1", "S2", "S4"]
+    assert common.summary() == "S1 (2015), S2 (2015, 2018), S4 (2021)"
+
+    assert align_stations(axes, "union").stations.tolist() == ["S1", "S2", "S3", "S4"]
+    assert align_stations(axes, "min_years", min_years=2).stations.tolist() == ["S2", "S3"]
+    with pytest.raises(ValueError):
+        align_stations(axes, "min_years")
+
+
+def test_load_station_index_rebuilds_for_new_version(metadata, tmp_path, monkeypatch):
+    path = tmp_path / "Metadata.xlsx"
+    metadata.to_excel(path, index=False)
+    load_station_index(path, cache_dir=tmp_path / "cache")
+    before = list((tmp_path / "cache").glob("stations-*.pkl"))
+
+    monkeypatch.setattr(stations_module, "INDEX_VERSION", "test")
+    load_station_index(path, cache_dir=tmp_path / "cache")
+    after = list((tmp_path / "cache").glob("stations-*.pkl"))
+
+    assert len(after) == 1 and after != before
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from timestamps import align_time_axis, check_hourly, parse_timestamps, regular_hours
+
+
+def year_text(year):
+    return pd.Series(regular_hours(year).strftime("%Y-%m-%d %H:%M:%S"), dtype=object)
+
+
+def test_parse_timestamps_known_layouts():
+    parsed = parse_timestamps([
+        "2015-01-01 01:00:00", "2015-01-01 02:00:00.005000", "2015-01-01 03:00",
+        "01.02.2015 04:00", datetime(2015, 1, 1, 5), None, "Czas pomiaru",
+    ])
+
+    assert parsed.dtype == "datetime64[us]"
+    assert parsed[:5].tolist() == [
+        pd.Timestamp("2015-01-01 01:00"), pd.Timestamp("2015-01-01 02:00:00.005"),
+        pd.Timestamp("2015-01-01 03:00"), pd.Timestamp("2015-02-01 04:00"),
+        pd.Timestamp("2015-01-01 05:00"),
+    ]
+    assert parsed[5:].isna().all()
+
+
+def test_check_hourly_reports_gaps_and_duplicates():
+    times = year_text(2018)
+    assert check_hourly(times, 2018).complete
+
+    broken = pd.concat([times.drop(index=[5, 6]), times.iloc[[10]], pd.Series(["2019-05-01 00:00:00"])])
+    check = check_hourly(broken, 2018)
+
+    assert not check.complete
+    assert (check.gaps, check.duplicates, check.off_grid, check.out_of_order) == (2, 1, 1, 1)
+
+
+def test_align_time_axis_synthesizes_complete_years():
+    drifted = regular_hours(2024) + pd.to_timedelta(np.arange(8784) * 4000, unit="us")
+
+    assert align_time_axis(drifted, 2024).equals(regular_hours(2024))
+    # an incomplete year keeps its own timestamps
+    assert align_time_axis(drifted[:-1], 2024).tolist() == drifted[:-1].tolist()
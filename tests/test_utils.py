@@ -0,0 +1,108 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils import add_city, assign_measurement_day, parse_decimal_comma, to_long
+
+
+def test_assign_measurement_day_midnight_belongs_to_previous_day():
+    df = pd.DataFrame({
+        "Datetime": pd.to_datetime([
+            "2018-01-01 01:00:00",
+            "2018-01-01 23:00:00",
+            "2018-01-02 00:00:00",
+            "2019-01-01 00:00:00",
+        ])
+    })
+
+    out = assign_measurement_day(df)
+
+    assert list(out["date"]) == list(pd.to_datetime([
+        "2018-01-01", "2018-01-01", "2018-01-01", "2018-12-31"
+    ]))
+    assert list(out["month"]) == [1, 1, 1, 12]
+
+
+def test_assign_measurement_day_matches_row_wise_rule():
+    # 2015 ma znaczniki czasu przesunięte o milisekundy
+    df = pd.DataFrame({
+        "Datetime": pd.date_range("2015-01-01 00:00:00.005", periods=72, freq="h")
+    })
+
+    expected = df["Datetime"].apply(
+        lambda x: x.date() if x.hour != 0 else (x - pd.Timedelta(days=1)).date()
+    )
+    out = assign_measurement_day(df.copy())
+
+    assert (pd.to_datetime(expected) == out["date"]).all()
+
+
+def test_parse_decimal_comma_handles_mixed_values():
+    values = np.array(["10,5", " 3,25 ", "7.5", 12.0, 4, None, np.nan, "bad", ""], dtype=object)
+
+    out = parse_decimal_comma(values)
+
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out[:5], [10.5, 3.25, 7.5, 12.0, 4.0])
+    assert np.isnan(out[5:]).all()
+
+
+def test_to_long_matches_melt_order():
+    df = pd.DataFrame({
+        "Datetime": ["2018-01-01 01:00:00", "2018-01-01 02:00:00"],
+        "ST01": ["1,5", "2,5"],
+        "ST02": [3.0, None],
+    })
+
+    long = to_long(df)
+    expected = pd.melt(df, id_vars=["Datetime"], var_name="station", value_name="PM2.5")
+
+    assert list(long["station"]) == list(expected["station"])
+    assert list(long["Datetime"]) == list(expected["Datetime"])
+    assert long["PM2.5"].dtype == "float32"
+    np.testing.assert_allclose(long["PM2.5"], [1.5, 2.5, 3.0, np.nan])
+
+
+def test_to_long_uses_shared_station_dictionary():
+    df = pd.DataFrame({
+        "Datetime": ["2018-01-01 01:00:00"],
+        "ST02": [1.0],
+        "NEW01": [2.0],
+    })
+
+    long = to_long(df, stations=pd.Index(["ST01", "ST02"]))
+
+    assert list(long["station"].cat.categories) == ["ST01", "ST02", "NEW01"]
+    assert list(long["station"]) == ["ST02", "NEW01"]
+
+
+def test_add_city_keeps_categorical_station_compact():
+    metadata = pd.DataFrame({
+        "Kod stacji": ["ST01", "ST02", "ST03"],
+        "Miejscowość": ["Warszawa", "Katowice", "Warszawa"],
+    })
+    df = pd.DataFrame({
+        "station": pd.Categorical(["ST01", "ST03", "ST02", "UNKNOWN"]),
+    })
+
+    out = add_city(df, metadata)
+
+    assert isinstance(out["city"].dtype, pd.CategoricalDtype)
+    assert list(out["city"].iloc[:3]) == ["Warszawa", "Warszawa", "Katowice"]
+    assert pd.isna(out["city"].iloc[3])
+
+
+def test_data_modules_do_not_import_plotting_or_http_packages():
+    code = (
+        "import sys, utils, pipeline, aggregate, visualizations; "
+        "print(sorted(m for m in ('matplotlib', 'seaborn', 'plotly', 'requests', 'urllib3') "
+        "if m in sys.modules))"
+    )
+    src = Path(__file__).resolve().parents[1] / "src"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         check=True, env={"PYTHONPATH": str(src)})
+
+    assert out.stdout.strip() == "[]"
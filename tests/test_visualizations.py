@@ -4,7 +4,7 @@ matplotlib.use("Agg")
 
 import pandas as pd
 import pytest
-from visualizations import plot_city_trends, plot_city_heatmaps
+from visualizations import plot_city_trends, plot_city_heatmaps, render_heatmaps
 
 
 # Sztuczne  dane do testów:
@@ -96,3 +96,12 @@ def test_plot_city_heatmaps_ignores_unknown_city(df_ex3_small):
     fig = plot_city_heatmaps(df_ex3_small, cities=cities, ncols=4)
     assert hasattr(fig, "axes")
 
+
+def test_render_heatmaps_writes_pages_and_per_city_files(df_ex3_small, tmp_path):
+    pages = render_heatmaps(df_ex3_small, tmp_path / "pages", per_page=2, workers=1)
+    per_city = render_heatmaps(df_ex3_small, tmp_path / "cities", cities=["A", "B"],
+                               file_format="svg", workers=1)
+
+    assert [p.name for p in pages] == ["heatmaps_001.png", "heatmaps_002.png", "heatmaps_003.png"]
+    assert [p.name for p in per_city] == ["heatmap_A.svg", "heatmap_B.svg"]
+    assert all(p.stat().st_size > 0 for p in pages + per_city)